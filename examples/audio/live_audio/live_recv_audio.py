@@ -46,6 +46,10 @@ async def main():
         # Switch audio channel on and start receiving audio frames
         conn.audio.switchAudioChannel(True)
 
+        # Play from a dedicated thread with 60 ms of buffering, so the blocking
+        # stream.write never stalls the connection and network jitter is absorbed
+        conn.audio.set_receive_buffer(latency=0.06, callback_thread=True)
+
         # Add callback to handle received audio frames
         conn.audio.add_track_callback(recv_audio_stream)
 
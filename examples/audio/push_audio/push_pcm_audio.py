@@ -0,0 +1,50 @@
+import asyncio
+import logging
+import os
+import sys
+import wave
+import numpy as np
+from go2_webrtc_driver.webrtc_driver import Go2WebRTCConnection, WebRTCConnectionMethod
+
+# Enable logging for debugging
+logging.basicConfig(level=logging.FATAL)
+
+async def main():
+    try:
+        # Choose a connection method (uncomment the correct one)
+        conn = Go2WebRTCConnection(WebRTCConnectionMethod.LocalSTA, ip="192.168.8.181")
+        # conn = Go2WebRTCConnection(WebRTCConnectionMethod.LocalSTA, serialNumber="B42D2000XXXXXXXX")
+        # conn = Go2WebRTCConnection(WebRTCConnectionMethod.Remote, serialNumber="B42D2000XXXXXXXX", username="email@gmail.com", password="pass")
+        # conn = Go2WebRTCConnection(WebRTCConnectionMethod.LocalAP)
+
+        await conn.connect()
+
+        # Outbound track fed directly with PCM, playback starts after 40 ms of buffering
+        track = conn.audio.create_push_track(latency=0.04)
+
+        wav_path = os.path.join(os.path.dirname(__file__), "..", "mp3_player", "dog-barking.wav")
+        with wave.open(wav_path, "rb") as wav:
+            rate = wav.getframerate()
+            channels = wav.getnchannels()
+            samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16).reshape(-1, channels)
+
+        # Push the clip in 100 ms chunks, as a TTS engine or microphone would deliver it
+        chunk = rate // 10
+        for start in range(0, len(samples), chunk):
+            track.push(samples[start:start + chunk], sample_rate=rate)
+            await asyncio.sleep(0.1)
+
+        await asyncio.sleep(1)
+        print(f"Underruns: {track.underruns}, overruns: {track.overruns}")
+
+    except ValueError as e:
+        # Log any value errors that occur during the process.
+        logging.error(f"An error occurred: {e}")
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        # Handle Ctrl+C to exit gracefully.
+        print("\nProgram interrupted by user")
+        sys.exit(0)
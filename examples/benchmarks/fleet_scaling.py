@@ -0,0 +1,90 @@
+"""
+Shows how LiDAR decoding throughput scales with the number of worker
+processes, using the same building blocks as FleetSupervisor: every worker
+decodes frames and writes the decoded result into its own SharedMemoryRing,
+and the parent drains all rings.
+
+Synthetic voxel frames are used so no robot is required.
+"""
+import argparse
+import multiprocessing
+import os
+import pickle
+import time
+
+import lz4.block
+import numpy as np
+
+from go2_webrtc_driver.shm_ring import SharedMemoryRing
+
+
+def synthetic_frame(density=0.002, seed=0):
+    rng = np.random.default_rng(seed)
+    bitmap = np.packbits(rng.random(0x10000 * 8) < density).tobytes()
+    compressed = lz4.block.compress(bitmap, store_size=False)
+    metadata = {"origin": [-3.2, -3.2, -0.5], "resolution": 0.05, "src_size": len(bitmap)}
+    return compressed, metadata
+
+
+def worker(ring_name, decoder_type, duration, start_at):
+    from go2_webrtc_driver.lidar.lidar_decoder_unified import UnifiedLidarDecoder
+
+    ring = SharedMemoryRing.attach(ring_name)
+    decoder = UnifiedLidarDecoder(decoder_type)
+    compressed, metadata = synthetic_frame()
+
+    while time.time() < start_at:
+        time.sleep(0.001)
+    end = start_at + duration
+    while time.time() < end:
+        decoded = decoder.decode(compressed, metadata)
+        ring.write(pickle.dumps(("rt/utlidar/voxel_map_compressed", decoded), protocol=pickle.HIGHEST_PROTOCOL))
+    ring.close()
+
+
+def run(processes, decoder_type, duration):
+    ctx = multiprocessing.get_context("spawn")
+    rings = [SharedMemoryRing(slots=8, slot_size=2 << 20) for _ in range(processes)]
+    start_at = time.time() + 2.0  # leave time for the workers to spawn
+    workers = [
+        ctx.Process(target=worker, args=(ring.name, decoder_type, duration, start_at))
+        for ring in rings
+    ]
+    for p in workers:
+        p.start()
+
+    cursors = [0] * processes
+    received = 0
+    while any(p.is_alive() for p in workers):
+        for i, ring in enumerate(rings):
+            messages, cursors[i] = ring.read_since(cursors[i])
+            received += len(messages)
+        time.sleep(0.001)
+
+    frames = sum(ring.write_seq for ring in rings)
+    for p in workers:
+        p.join()
+    for ring in rings:
+        ring.close()
+        ring.unlink()
+    return frames / duration, received
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--max-processes", type=int, default=os.cpu_count())
+    parser.add_argument("--decoder", choices=["native", "libvoxel"], default="native")
+    parser.add_argument("--duration", type=float, default=5.0)
+    args = parser.parse_args()
+
+    counts = sorted({1, 2, 4, 8, 16, 32, args.max_processes} & set(range(1, args.max_processes + 1)))
+    baseline = None
+    print(f"{'processes':>10}{'frames/s':>12}{'speedup':>10}{'read':>10}")
+    for processes in counts:
+        rate, received = run(processes, args.decoder, args.duration)
+        baseline = baseline or rate
+        print(f"{processes:>10}{rate:>12.1f}{rate / baseline:>9.2f}x{received:>10}")
+
+
+if __name__ == "__main__":
+    main()
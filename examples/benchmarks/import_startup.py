@@ -0,0 +1,69 @@
+"""
+Measures the cold start cost of importing the driver and creating the data
+channel, compared with the previous eager behaviour where numpy, wasmtime, lz4,
+Crypto and sounddevice were imported up front and a LibVoxelDecoder was built
+for every WebRTCDataChannel.
+
+Every measurement runs in a fresh interpreter so module caches do not leak
+between runs.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+LAZY = """
+import go2_webrtc_driver.webrtc_driver
+"""
+
+EAGER = """
+import go2_webrtc_driver.webrtc_driver
+import numpy, wave, wasmtime, lz4.block, Crypto.Cipher.AES
+try:
+    import sounddevice
+except (ImportError, OSError):
+    pass
+from go2_webrtc_driver.lidar.lidar_decoder_unified import UnifiedLidarDecoder
+UnifiedLidarDecoder("libvoxel")
+"""
+
+PROBE = """
+import json, resource, sys, time
+t0 = time.perf_counter()
+exec(sys.argv[1])
+elapsed = time.perf_counter() - t0
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({"elapsed": elapsed, "rss_kb": rss_kb}))
+"""
+
+
+def measure(code, runs):
+    elapsed, rss = [], []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", PROBE, code],
+            check=True, capture_output=True, text=True,
+        ).stdout.strip().splitlines()[-1]
+        result = json.loads(out)
+        elapsed.append(result["elapsed"])
+        rss.append(result["rss_kb"])
+    return statistics.median(elapsed), statistics.median(rss)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", "--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    lazy_time, lazy_rss = measure(LAZY, args.runs)
+    eager_time, eager_rss = measure(EAGER, args.runs)
+
+    print(f"{'':<10}{'import time':>14}{'max RSS':>12}")
+    print(f"{'eager':<10}{eager_time * 1000:>12.1f}ms{eager_rss / 1024:>10.1f}MB")
+    print(f"{'lazy':<10}{lazy_time * 1000:>12.1f}ms{lazy_rss / 1024:>10.1f}MB")
+    print(f"{'saved':<10}{(eager_time - lazy_time) * 1000:>12.1f}ms{(eager_rss - lazy_rss) / 1024:>10.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Compares per-frame colour conversion cost of video subscribers with and
+without the shared CachedVideoFrame.
+
+The old path converted every frame to bgr24 in each subscriber and then back
+to RGB with a second full-frame pass (cv2.cvtColor in robot_controller). With
+CachedVideoFrame each format is converted once per frame, whatever the number
+of subscribers, and RGB consumers ask for rgb24 directly. A single
+consumer can also have the conversion written into an array it reuses.
+
+The last row is a detector-like subscriber (5 fps, centre crop scaled to a
+quarter) reading a 30 fps stream: skipped frames are never converted and
+the crop and scale happen in YUV before the colour conversion.
+"""
+import argparse
+import fractions
+import time
+
+import av
+import numpy as np
+
+from go2_webrtc_driver.webrtc_video import CachedVideoFrame, VideoSubscriberTrack
+
+
+def make_frames(count, width, height):
+    frames = []
+    for i in range(count):
+        image = np.random.default_rng(i).integers(0, 255, (height, width, 3), dtype=np.uint8)
+        frames.append(av.VideoFrame.from_ndarray(image, format="bgr24").reformat(format="yuv420p"))
+    return frames
+
+
+def run_uncached(frames, subscribers):
+    for frame in frames:
+        for _ in range(subscribers):
+            bgr = frame.to_ndarray(format="bgr24")
+            # Stand-in for cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+            np.ascontiguousarray(bgr[:, :, ::-1])
+
+
+def run_cached(frames, subscribers):
+    for frame in frames:
+        shared = CachedVideoFrame(frame)
+        for _ in range(subscribers):
+            shared.to_ndarray(format="rgb24")
+
+
+def run_preallocated(frames, out):
+    for frame in frames:
+        CachedVideoFrame(frame).to_ndarray(format="rgb24", out=out)
+
+
+def run_adaptive(frames, width, height):
+    subscriber = VideoSubscriberTrack(
+        None, queue_size=len(frames), max_fps=5,
+        crop=(width // 4, height // 4, width // 2, height // 2), size=(width // 4, height // 4),
+    )
+    for i, frame in enumerate(frames):
+        frame.pts = i * 3000
+        frame.time_base = fractions.Fraction(1, 90000)
+        subscriber.put_frame(CachedVideoFrame(frame))
+    while not subscriber.queue.empty():
+        frame, _ = subscriber.queue.get_nowait()
+        frame.to_ndarray(format="rgb24")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", "--frames", type=int, default=100)
+    parser.add_argument("-s", "--subscribers", type=int, default=3)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    args = parser.parse_args()
+
+    frames = make_frames(args.frames, args.width, args.height)
+    out = np.empty((args.height, args.width, 3), dtype=np.uint8)
+
+    start = time.perf_counter()
+    run_uncached(frames, args.subscribers)
+    uncached = (time.perf_counter() - start) / args.frames
+
+    start = time.perf_counter()
+    run_cached(frames, args.subscribers)
+    cached = (time.perf_counter() - start) / args.frames
+
+    start = time.perf_counter()
+    run_preallocated(frames, out)
+    preallocated = (time.perf_counter() - start) / args.frames
+
+    start = time.perf_counter()
+    run_adaptive(frames, args.width, args.height)
+    adaptive = (time.perf_counter() - start) / args.frames
+
+    print(f"{args.subscribers} subscribers, {args.width}x{args.height}")
+    print(f"{'per subscriber bgr24 + RGB swap':<34}{uncached * 1000:>8.2f}ms/frame")
+    print(f"{'shared rgb24':<34}{cached * 1000:>8.2f}ms/frame")
+    print(f"{'one subscriber, rgb24 into out=':<34}{preallocated * 1000:>8.2f}ms/frame")
+    print(f"{'one subscriber, 5 fps, ROI 1/4':<34}{adaptive * 1000:>8.2f}ms/frame")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Compares aiortc's single threaded H.264 decoding with ThreadedVideoDecoder.
+
+Two measurements are made on a synthetic 1280x720 stream:
+
+* decode time per frame of the same encoded stream, with a plain codec
+  context (what aiortc uses) and with libavcodec threading enabled;
+* event loop lag while the stream is received over a local peer connection
+  pair, with the default receiver and with video_decode_thread enabled.
+"""
+import argparse
+import asyncio
+import fractions
+import time
+
+import av
+import numpy as np
+from aiortc import RTCPeerConnection, RTCRtpSender
+from aiortc.mediastreams import MediaStreamError, MediaStreamTrack
+
+from go2_webrtc_driver.connection_profiler import LoopLagMonitor, window_stats
+from go2_webrtc_driver.webrtc_video import WebRTCVideoChannel
+
+
+def make_image(i, width, height):
+    # Moving gradient with some texture, so frames are not trivially compressible
+    x = np.arange(width, dtype=np.uint16)
+    y = np.arange(height, dtype=np.uint16)[:, None]
+    image = np.empty((height, width, 3), dtype=np.uint8)
+    image[:, :, 0] = (x + 4 * i) % 256
+    image[:, :, 1] = (y * 2 + i) % 256
+    image[:, :, 2] = ((x ^ y) + i) % 256
+    return image
+
+
+class SyntheticTrack(MediaStreamTrack):
+    kind = "video"
+
+    def __init__(self, frames, width, height, fps):
+        super().__init__()
+        self.frames = frames
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.index = 0
+
+    async def recv(self):
+        if self.index >= self.frames:
+            self.stop()
+            raise MediaStreamError
+        await asyncio.sleep(1 / self.fps)
+        self.index += 1
+        frame = av.VideoFrame.from_ndarray(make_image(self.index, self.width, self.height), format="bgr24")
+        frame.pts = self.index * int(90000 / self.fps)
+        frame.time_base = fractions.Fraction(1, 90000)
+        return frame
+
+
+def encode_stream(frames, width, height):
+    encoder = av.CodecContext.create("libx264", "w")
+    encoder.width = width
+    encoder.height = height
+    encoder.pix_fmt = "yuv420p"
+    encoder.time_base = fractions.Fraction(1, 30)
+    encoder.options = {"tune": "zerolatency", "g": "60"}
+    packets = []
+    for i in range(frames):
+        frame = av.VideoFrame.from_ndarray(make_image(i, width, height), format="bgr24")
+        frame.pts = i
+        packets.extend(bytes(p) for p in encoder.encode(frame))
+    packets.extend(bytes(p) for p in encoder.encode(None))
+    return packets
+
+
+def decode_times(packets, thread_type):
+    codec = av.CodecContext.create("h264", "r")
+    codec.thread_type = thread_type
+    times = []
+    for data in packets:
+        started = time.perf_counter()
+        codec.decode(av.Packet(data))
+        times.append(time.perf_counter() - started)
+    return times
+
+
+async def loop_lag(threaded, frames, width, height, fps):
+    sender = RTCPeerConnection()
+    receiver = RTCPeerConnection()
+    transceiver = sender.addTransceiver(SyntheticTrack(frames, width, height, fps), direction="sendonly")
+    transceiver.setCodecPreferences(
+        [codec for codec in RTCRtpSender.getCapabilities("video").codecs if codec.mimeType == "video/H264"]
+    )
+    video = WebRTCVideoChannel(receiver, None)
+    if threaded:
+        video.enable_decode_thread()
+
+    @receiver.on("track")
+    async def on_track(track):
+        await video.track_handler(track)
+
+    subscriber = video.subscribe(queue_size=frames)
+    monitor = LoopLagMonitor()
+    monitor.start()
+
+    await sender.setLocalDescription(await sender.createOffer())
+    await receiver.setRemoteDescription(sender.localDescription)
+    await receiver.setLocalDescription(await receiver.createAnswer())
+    await sender.setRemoteDescription(receiver.localDescription)
+
+    received = 0
+    try:
+        while True:
+            await asyncio.wait_for(subscriber.recv(), 5)
+            received += 1
+    except (MediaStreamError, asyncio.TimeoutError):
+        pass
+    monitor.stop()
+    decode_stats = video.get_decode_stats()
+    await sender.close()
+    await receiver.close()
+    return received, monitor.stats(), decode_stats
+
+
+def print_row(name, stats):
+    print(f"{name:<28}{stats['p50'] * 1000:>8.2f}ms{stats['p90'] * 1000:>8.2f}ms"
+          f"{stats['p99'] * 1000:>8.2f}ms{stats['max'] * 1000:>8.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", "--frames", type=int, default=150)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--fps", type=int, default=30)
+    args = parser.parse_args()
+
+    packets = encode_stream(args.frames, args.width, args.height)
+    print(f"{'':<28}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}")
+    print_row("decode, single thread", window_stats(decode_times(packets, "NONE")))
+    print_row("decode, thread_type=AUTO", window_stats(decode_times(packets, "AUTO")))
+
+    for threaded in (False, True):
+        received, lag, _ = asyncio.run(loop_lag(threaded, args.frames, args.width, args.height, args.fps))
+        name = "loop lag, decode thread" if threaded else "loop lag, aiortc decoder"
+        print_row(f"{name}", lag)
+        print(f"{'':<28}{received} frames received")
+
+
+if __name__ == "__main__":
+    main()
@@ -143,6 +143,9 @@ async def lidar_webrtc_connection():
             # Disable traffic saving mode
             await conn.datachannel.disableTrafficSaving(True)
 
+            # Let the decoder deduplicate the mesh vertices
+            conn.datachannel.set_decoder("libvoxel", unique_points=True)
+
             # Turn LIDAR sensor on
             conn.datachannel.pub_sub.publish_without_callback("rt/utlidar/switch", "on")
 
@@ -162,9 +165,8 @@ async def lidar_webrtc_connection():
 
                     positions = message["data"]["data"].get("positions", [])
                     origin = message["data"].get("origin", [])
-                    points = np.array([positions[i:i+3] for i in range(0, len(positions), 3)], dtype=np.float32)
-                    total_points = len(points)
-                    unique_points = np.unique(points, axis=0)
+                    total_points = len(positions) // 3
+                    unique_points = message["data"]["data"]["unique_positions"].astype(np.float32)
 
                     # Save to CSV
                     if SAVE_LIDAR_DATA and lidar_csv_writer:
@@ -0,0 +1,43 @@
+import asyncio
+import logging
+import sys
+from go2_webrtc_driver.fleet import Fleet
+from go2_webrtc_driver.constants import RTC_TOPIC, WebRTCConnectionMethod
+
+# Enable logging for debugging
+logging.basicConfig(level=logging.FATAL)
+
+def display_battery(name, message):
+    bms_state = message['data']['bms_state']
+    print(f"{name}: SOC {bms_state['soc']}%, current {bms_state['current']} mA")
+
+async def main():
+    fleet = Fleet()
+    try:
+        # Add every robot of the lab; all of them share one event loop,
+        # one discovery socket and one LiDAR decoder pool
+        fleet.add_robot("go2-a", WebRTCConnectionMethod.LocalSTA, ip="192.168.8.181")
+        fleet.add_robot("go2-b", WebRTCConnectionMethod.LocalSTA, serialNumber="B42D2000XXXXXXXX")
+
+        results = await fleet.connect_all()
+        for name, error in results.items():
+            if error:
+                print(f"{name} failed to connect: {error}")
+
+        # Subscribe all connected robots to their low state
+        fleet.subscribe(RTC_TOPIC['LOW_STATE'], display_battery)
+
+        # Keep the program running for a while
+        await asyncio.sleep(3600)
+
+    finally:
+        await fleet.disconnect_all()
+        fleet.close()
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        # Handle Ctrl+C to exit gracefully.
+        print("\nProgram interrupted by user")
+        sys.exit(0)
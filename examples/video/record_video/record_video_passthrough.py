@@ -0,0 +1,48 @@
+import asyncio
+import logging
+import sys
+from go2_webrtc_driver.webrtc_driver import Go2WebRTCConnection, WebRTCConnectionMethod
+
+# Enable logging for debugging
+logging.basicConfig(level=logging.FATAL)
+
+record_duration = 60  # Record for 60 seconds
+segment_duration = 20  # Start a new file every 20 seconds
+
+# Main function for setting up the WebRTC connection and recording the camera
+async def main():
+    try:
+        # Choose a connection method (uncomment the correct one)
+        conn = Go2WebRTCConnection(WebRTCConnectionMethod.LocalSTA, ip="192.168.8.181")
+        # conn = Go2WebRTCConnection(WebRTCConnectionMethod.LocalSTA, serialNumber="B42D2000XXXXXXXX")
+        # conn = Go2WebRTCConnection(WebRTCConnectionMethod.Remote, serialNumber="B42D2000XXXXXXXX", username="email@gmail.com", password="pass")
+        # conn = Go2WebRTCConnection(WebRTCConnectionMethod.LocalAP)
+
+        # Connect to the device
+        await conn.connect()
+
+        # Mux the H.264 stream into MKV segments as received, without decoding it
+        recorder = conn.video.start_recording("recordings", container="mkv", segment_duration=segment_duration)
+
+        # Switch video channel on and start receiving video frames
+        conn.video.switchVideoChannel(True)
+
+        await asyncio.sleep(record_duration)
+
+        await conn.video.stop_recording()
+        print(f"Recorded {recorder.frames_written} frames ({recorder.dropped} dropped) to:")
+        for segment in recorder.segments:
+            print(f"  {segment}")
+
+        await conn.disconnect()
+
+    except ValueError as e:
+        logging.error(f"Error in WebRTC connection: {e}")
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        # Handle Ctrl+C to exit gracefully.
+        print("\nProgram interrupted by user")
+        sys.exit(0)
@@ -0,0 +1,147 @@
+import fractions
+import logging
+import os
+import queue
+import threading
+import time
+import wave
+
+import av
+
+# Container and codec per output format; WAV is written with the wave module
+FORMATS = {
+    "wav": None,
+    "flac": ("flac", "flac"),
+    "opus": ("ogg", "libopus"),
+}
+
+
+class AudioRecorder:
+    """
+    Writes received audio to rolling WAV/FLAC/Opus files from a background thread.
+
+    write_frame() only queues the frame, so it is safe to call from the event
+    loop; resampling, encoding and disk writes all happen in the writer
+    thread. A new file is started every `segment_duration` seconds of audio.
+    """
+
+    def __init__(self, directory=".", prefix="go2_audio", format="wav", segment_duration=600.0,
+                 sample_rate=48000, channels=2, max_queue=500):
+        """
+        :param directory: Directory the files are written to.
+        :param prefix: File name prefix, followed by the segment start time and index.
+        :param format: "wav", "flac" or "opus" (Ogg).
+        :param segment_duration: Seconds of audio per file, None for a single file.
+        :param sample_rate: Sample rate of the files.
+        :param channels: 1 or 2.
+        :param max_queue: Frames buffered for the writer before frames are dropped (500 = 10 s).
+        """
+        if format not in FORMATS:
+            raise ValueError(f"Unsupported audio format: {format}")
+        self.directory = directory
+        self.prefix = prefix
+        self.format = format
+        self.segment_duration = segment_duration
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.segments = []
+        self.samples_written = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._resampler = av.AudioResampler(
+            format="s16", layout="mono" if channels == 1 else "stereo", rate=sample_rate
+        )
+        self._path = None
+        self._wave = None
+        self._container = None
+        self._stream = None
+        self._segment_samples = 0
+        self._time_base = fractions.Fraction(1, sample_rate)
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="audio-recorder", daemon=True)
+        self._thread.start()
+
+    def write_frame(self, frame):
+        """Queue an av.AudioFrame. Never blocks."""
+        try:
+            self._queue.put_nowait(frame)
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self):
+        """Write the queued frames and close the current file."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        try:
+            while True:
+                frame = self._queue.get()
+                if frame is None:
+                    break
+                try:
+                    for resampled in self._resampler.resample(frame):
+                        self._write(resampled)
+                except Exception as e:
+                    logging.error(f"Failed to record audio frame: {e}")
+        finally:
+            self._close_segment()
+
+    def _write(self, frame):
+        if self._path is None:
+            self._open_segment()
+        elif self.segment_duration is not None and \
+                self._segment_samples >= self.segment_duration * self.sample_rate:
+            self._close_segment()
+            self._open_segment()
+
+        if self._wave is not None:
+            self._wave.writeframes(frame.to_ndarray().tobytes())
+        else:
+            # Timestamps restart with every file
+            frame.pts = self._segment_samples
+            frame.time_base = self._time_base
+            for packet in self._stream.encode(frame):
+                self._container.mux(packet)
+        self._segment_samples += frame.samples
+        self.samples_written += frame.samples
+
+    def _open_segment(self):
+        name = f"{self.prefix}_{time.strftime('%Y%m%d_%H%M%S')}_{len(self.segments):04d}.{self.format}"
+        self._path = os.path.join(self.directory, name)
+        self._segment_samples = 0
+        if self.format == "wav":
+            self._wave = wave.open(self._path, "wb")
+            self._wave.setnchannels(self.channels)
+            self._wave.setsampwidth(2)
+            self._wave.setframerate(self.sample_rate)
+        else:
+            container_format, codec = FORMATS[self.format]
+            self._container = av.open(self._path, "w", format=container_format)
+            self._stream = self._container.add_stream(codec, rate=self.sample_rate)
+            self._stream.layout = "mono" if self.channels == 1 else "stereo"
+        logging.info(f"Recording audio to {self._path}")
+
+    def _close_segment(self):
+        if self._path is None:
+            return
+        try:
+            if self._wave is not None:
+                self._wave.close()
+            else:
+                # Flush the encoder
+                for packet in self._stream.encode(None):
+                    self._container.mux(packet)
+                self._container.close()
+        except Exception as e:
+            logging.error(f"Failed to close {self._path}: {e}")
+        self.segments.append(self._path)
+        self._path = None
+        self._wave = None
+        self._container = None
+        self._stream = None
@@ -0,0 +1,131 @@
+import time
+
+import av
+import numpy as np
+
+
+class AudioRingBuffer:
+    """
+    Preallocated int16 ring of the last `seconds` of received audio.
+
+    Every frame is written twice, at its position and one capacity further,
+    so any window of up to `seconds` is a contiguous slice of the backing
+    array: readers get numpy views without copying or locking. There is a
+    single writer (the audio receive task); a view stays valid until the
+    writer has moved `seconds` past its start, which readers can check with
+    is_valid() after using it.
+
+    Samples are addressed by their absolute index since the first write;
+    pts() and time_of() map an index to the RTP sample clock and wall time.
+    """
+
+    def __init__(self, seconds=10.0, sample_rate=48000, channels=2, layout="interleaved"):
+        """
+        :param seconds: Amount of audio kept.
+        :param sample_rate: Sample rate of the stored audio; frames at another rate are resampled.
+        :param channels: 1 or 2; frames with another channel count are remixed.
+        :param layout: "interleaved" for (samples, channels) views, "planar" for (channels, samples).
+        """
+        if layout not in ("interleaved", "planar"):
+            raise ValueError(f"Unsupported layout: {layout}")
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.layout = layout
+        self.capacity = int(seconds * sample_rate)
+        if layout == "interleaved":
+            self.buffer = np.zeros((2 * self.capacity, channels), dtype=np.int16)
+        else:
+            self.buffer = np.zeros((channels, 2 * self.capacity), dtype=np.int16)
+        # Absolute index of the next sample to be written
+        self.written = 0
+        # pts of sample index 0 according to the latest frame, and wall time of the latest sample
+        self._pts_offset = None
+        self._written_at = None
+        self._resampler = None
+
+    def _to_samples(self, frame):
+        """Frame samples as a (samples, channels) int16 array."""
+        layout = "mono" if self.channels == 1 else "stereo"
+        if frame.format.name != "s16" or frame.sample_rate != self.sample_rate or frame.layout.name != layout:
+            if self._resampler is None:
+                self._resampler = av.AudioResampler(format="s16", layout=layout, rate=self.sample_rate)
+            frames = self._resampler.resample(frame)
+            if not frames:
+                return None
+            return np.concatenate([f.to_ndarray().reshape(-1, self.channels) for f in frames])
+        return frame.to_ndarray().reshape(-1, self.channels)
+
+    def write_frame(self, frame):
+        """Append an av.AudioFrame."""
+        samples = self._to_samples(frame)
+        if samples is None:
+            return
+        start = self.written
+        self.write(samples)
+        if frame.pts is not None and self._resampler is None:
+            self._pts_offset = frame.pts - start
+
+    def write(self, samples):
+        """Append a (samples, channels) int16 array."""
+        samples = samples[-self.capacity:]
+        count = len(samples)
+        position = self.written % self.capacity
+        # First copy at the ring position, possibly wrapping around
+        first = min(count, self.capacity - position)
+        self._store(position, samples[:first])
+        self._store(0, samples[first:])
+        # Mirror copy one capacity further, so windows never wrap
+        self._store(position + self.capacity, samples[:first])
+        self._store(self.capacity, samples[first:])
+        self.written += count
+        self._written_at = time.time()
+
+    def _store(self, offset, samples):
+        if not len(samples):
+            return
+        if self.layout == "interleaved":
+            self.buffer[offset:offset + len(samples)] = samples
+        else:
+            self.buffer[:, offset:offset + len(samples)] = samples.T
+
+    def read(self, count, end=None):
+        """
+        View of `count` samples ending before absolute index `end` (default: latest).
+
+        :return: (view, start_index); the view is shorter if less audio is available.
+        """
+        end = self.written if end is None else min(end, self.written)
+        start = max(end - count, self.written - self.capacity, 0)
+        if start >= end:
+            return self._view(0, 0), end
+        offset = start % self.capacity
+        return self._view(offset, offset + end - start), start
+
+    def latest(self, seconds):
+        """View of the last `seconds` of audio and the index of its first sample."""
+        return self.read(int(seconds * self.sample_rate))
+
+    def read_since(self, index):
+        """Everything written since absolute index `index`, as (view, start_index)."""
+        return self.read(self.written - index)
+
+    def _view(self, start, stop):
+        if self.layout == "interleaved":
+            return self.buffer[start:stop]
+        return self.buffer[:, start:stop]
+
+    def is_valid(self, start_index):
+        """Whether a view starting at `start_index` has not been overwritten yet."""
+        return self.written - start_index <= self.capacity
+
+    def pts(self, index):
+        """RTP timestamp (in samples) of absolute sample `index`, None if unknown."""
+        if self._pts_offset is None:
+            return None
+        return self._pts_offset + index
+
+    def time_of(self, index):
+        """Estimated wall time sample `index` was received."""
+        if self._written_at is None:
+            return None
+        return self._written_at - (self.written - index) / self.sample_rate
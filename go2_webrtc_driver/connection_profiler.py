@@ -0,0 +1,240 @@
+import argparse
+import asyncio
+import json
+import logging
+import math
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from .constants import WebRTCConnectionMethod
+
+
+class ConnectionTimeline:
+    """
+    Monotonic timeline of the phases of a single connection attempt.
+
+    Phases are recorded as (start, end) offsets in seconds relative to the
+    moment the timeline was created. A phase may be opened in one callback and
+    closed in another, which is how the event driven phases (DTLS, SCTP,
+    validation) are tracked.
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._t0 = time.monotonic()
+        self._phases = {}
+
+    def _now(self):
+        return time.monotonic() - self._t0
+
+    def start(self, phase):
+        """Mark the beginning of a phase."""
+        self._phases[phase] = [self._now(), None]
+
+    def end(self, phase):
+        """Mark the end of a phase. Phases that were never started are ignored."""
+        span = self._phases.get(phase)
+        if span is not None and span[1] is None:
+            span[1] = self._now()
+
+    @contextmanager
+    def phase(self, phase):
+        """Context manager recording the enclosed block as a phase."""
+        self.start(phase)
+        try:
+            yield
+        finally:
+            self.end(phase)
+
+    def duration(self, phase):
+        """Duration of a completed phase in seconds, or None."""
+        span = self._phases.get(phase)
+        if span is None or span[1] is None:
+            return None
+        return span[1] - span[0]
+
+    def total(self):
+        """Time from the start of the timeline to the end of the last completed phase."""
+        ends = [end for _, end in self._phases.values() if end is not None]
+        return max(ends) if ends else 0.0
+
+    def to_dict(self):
+        return {
+            "started_at": self.started_at,
+            "total": self.total(),
+            "phases": [
+                {
+                    "name": name,
+                    "start": start,
+                    "end": end,
+                    "duration": None if end is None else end - start,
+                }
+                for name, (start, end) in self._phases.items()
+            ],
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict())
+
+    def __repr__(self):
+        parts = []
+        for name, (start, end) in self._phases.items():
+            duration = "..." if end is None else f"{(end - start) * 1000:.1f}ms"
+            parts.append(f"{name}={duration}")
+        return f"ConnectionTimeline({', '.join(parts)})"
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def window_stats(values, percentiles=(50, 90, 99)):
+    """
+    Percentile statistics of a list of samples.
+
+    :return: {"count", "p50", ..., "max"}, with None values when there are no samples.
+    """
+    stats = {"count": len(values)}
+    for pct in percentiles:
+        stats[f"p{pct}"] = percentile(values, pct)
+    stats["max"] = max(values) if values else None
+    return stats
+
+
+class LoopLagMonitor:
+    """
+    Measures event loop lag: how late the loop wakes up from a short sleep.
+
+    Anything running on the loop thread for longer than `interval` (a decoder,
+    a large JSON message, a blocking callback) shows up as lag, so this tells
+    whether heartbeats and data channel handling are being delayed.
+    """
+
+    def __init__(self, interval=0.01, window=1000):
+        self.interval = interval
+        self.samples = deque(maxlen=window)
+        self._task = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def reset(self):
+        self.samples.clear()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            before = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - before - self.interval))
+
+    def stats(self, percentiles=(50, 90, 99)):
+        """Lag statistics in seconds over the last `window` samples."""
+        return window_stats(list(self.samples), percentiles)
+
+
+def summarize(timelines, percentiles=(50, 90, 99)):
+    """
+    Aggregate several timelines into per-phase percentile statistics.
+
+    :return: dict of phase name -> {"count", "p50", ..., "max"} in seconds.
+    """
+    samples = {}
+    for timeline in timelines:
+        for phase in timeline.to_dict()["phases"]:
+            if phase["duration"] is not None:
+                samples.setdefault(phase["name"], []).append(phase["duration"])
+        samples.setdefault("total", []).append(timeline.total())
+
+    return {name: window_stats(values, percentiles) for name, values in samples.items()}
+
+
+def print_summary(summary, percentiles=(50, 90, 99)):
+    header = f"{'phase':<22}{'n':>5}" + "".join(f"{'p' + str(p):>10}" for p in percentiles) + f"{'max':>10}"
+    print(header)
+    print("-" * len(header))
+    for name, stats in summary.items():
+        row = f"{name:<22}{stats['count']:>5}"
+        for pct in percentiles:
+            row += f"{stats[f'p{pct}'] * 1000:>8.1f}ms"
+        row += f"{stats['max'] * 1000:>8.1f}ms"
+        print(row)
+
+
+async def profile_connections(conn_factory, runs, delay=1.0, fresh=False):
+    """
+    Connect `runs` times and collect the timeline of every attempt.
+
+    :param conn_factory: Callable returning a new Go2WebRTCConnection.
+    :param fresh: Build a new connection for every run instead of reconnecting.
+    """
+    timelines = []
+    conn = conn_factory()
+    for i in range(runs):
+        if fresh and i > 0:
+            conn = conn_factory()
+        try:
+            await conn.connect()
+            timelines.append(conn.timeline)
+            logging.info("Run %d: %r", i + 1, conn.timeline)
+        except Exception as e:
+            logging.error(f"Run {i + 1} failed: {e}")
+        finally:
+            await conn.disconnect()
+        await asyncio.sleep(delay)
+    return timelines
+
+
+def main():
+    from .webrtc_driver import Go2WebRTCConnection
+
+    methods = {
+        "ap": WebRTCConnectionMethod.LocalAP,
+        "sta": WebRTCConnectionMethod.LocalSTA,
+        "remote": WebRTCConnectionMethod.Remote,
+    }
+
+    parser = argparse.ArgumentParser(description="Profile Go2 WebRTC connection startup")
+    parser.add_argument("--method", choices=methods.keys(), default="sta")
+    parser.add_argument("--ip")
+    parser.add_argument("--serial")
+    parser.add_argument("--username")
+    parser.add_argument("--password")
+    parser.add_argument("-n", "--runs", type=int, default=10)
+    parser.add_argument("--delay", type=float, default=1.0, help="Seconds to wait between runs")
+    parser.add_argument("--fresh", action="store_true", help="Create a new connection object for every run")
+    parser.add_argument("--json", help="Append every timeline as a JSON line to this file")
+    args = parser.parse_args()
+
+    def conn_factory():
+        return Go2WebRTCConnection(
+            methods[args.method],
+            serialNumber=args.serial,
+            ip=args.ip,
+            username=args.username,
+            password=args.password,
+            timeline_log=args.json,
+        )
+
+    timelines = asyncio.run(profile_connections(conn_factory, args.runs, args.delay, args.fresh))
+    if not timelines:
+        print("No successful connections")
+        return
+    print(f"\nConnection startup over {len(timelines)} run(s):")
+    print_summary(summarize(timelines))
+
+
+if __name__ == '__main__':
+    main()
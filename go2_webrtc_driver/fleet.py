@@ -0,0 +1,177 @@
+import asyncio
+import logging
+
+from .webrtc_driver import Go2WebRTCConnection
+from .multicast_scanner import MulticastDiscovery
+from .lidar.lidar_decoder_unified import LidarDecoderPool
+from .util import print_status
+
+
+class Fleet:
+    """
+    Manages many Go2WebRTCConnection instances on a single event loop.
+
+    All robots share one multicast discovery socket and one LiDAR decoder
+    pool. Subscriptions and publishes are applied to every robot (or a chosen
+    subset) and their results are collected per robot name.
+
+    A single loop is limited to one CPU core; FleetSupervisor runs one Fleet
+    per worker process to spread robots over several cores.
+    """
+
+    def __init__(self, discovery: MulticastDiscovery = None, decoder_pool: LidarDecoderPool = None):
+        # Only a discovery created here is closed by close()
+        self._owns_discovery = discovery is None
+        self.discovery = discovery or MulticastDiscovery()
+        self.decoder_pool = decoder_pool or LidarDecoderPool()
+        self.connections = {}
+        self.subscriptions = {}  # topic -> callback(name, message)
+        self._handlers = {}  # (robot name, topic) -> callback registered on the robot's data channel
+
+    def add_robot(self, name, connectionMethod, **kwargs) -> Go2WebRTCConnection:
+        """
+        Create a connection that uses the fleet's shared discovery and decoders.
+
+        :param name: Unique name used to address the robot in the fleet.
+        :param connectionMethod: WebRTCConnectionMethod of the robot.
+        :param kwargs: Remaining Go2WebRTCConnection arguments (serialNumber, ip, ...).
+        """
+        kwargs.setdefault("discovery", self.discovery)
+        kwargs.setdefault("decoder_pool", self.decoder_pool)
+        return self.add_connection(name, Go2WebRTCConnection(connectionMethod, **kwargs))
+
+    def add_connection(self, name, conn: Go2WebRTCConnection) -> Go2WebRTCConnection:
+        """Add an existing connection to the fleet."""
+        if name in self.connections:
+            raise ValueError(f"Robot '{name}' is already part of the fleet")
+        if conn.discovery is None:
+            conn.discovery = self.discovery
+        if conn.decoder_pool is None:
+            conn.decoder_pool = self.decoder_pool
+        self.connections[name] = conn
+        return conn
+
+    async def remove_robot(self, name):
+        """Disconnect a robot and remove it from the fleet."""
+        conn = self.connections.pop(name)
+        for key in [key for key in self._handlers if key[0] == name]:
+            del self._handlers[key]
+        await conn.disconnect()
+
+    def __getitem__(self, name) -> Go2WebRTCConnection:
+        return self.connections[name]
+
+    def __iter__(self):
+        return iter(self.connections)
+
+    def __len__(self):
+        return len(self.connections)
+
+    def connected(self):
+        """Names of the robots whose data channel is validated."""
+        return [
+            name for name, conn in self.connections.items()
+            if getattr(conn, "datachannel", None) is not None and conn.datachannel.data_channel_opened
+        ]
+
+    async def connect_all(self, max_concurrency=8):
+        """
+        Connect every robot, at most `max_concurrency` at a time.
+
+        :return: dict of robot name -> None on success or the raised exception.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def connect_one(name, conn):
+            async with semaphore:
+                try:
+                    await conn.connect()
+                except Exception as e:
+                    logging.error(f"Failed to connect {name}: {e}")
+                    return e
+                self._apply_subscriptions(name)
+                return None
+
+        names = list(self.connections)
+        results = await asyncio.gather(*(connect_one(name, self.connections[name]) for name in names))
+        print_status("Fleet", f"🟢 {results.count(None)}/{len(names)} connected")
+        return dict(zip(names, results))
+
+    async def disconnect_all(self):
+        await asyncio.gather(*(conn.disconnect() for conn in self.connections.values()), return_exceptions=True)
+
+    def close(self):
+        """Release the discovery socket, unless the discovery was passed in."""
+        if self._owns_discovery:
+            self.discovery.close()
+
+    def _targets(self, robots):
+        names = self.connected() if robots is None else robots
+        return {name: self.connections[name] for name in names}
+
+    def _apply_subscriptions(self, name):
+        for topic in self.subscriptions:
+            self._subscribe_one(name, topic)
+
+    def _subscribe_one(self, name, topic):
+        # One handler per robot and topic, calling the fleet's current callback
+        handler = self._handlers.get((name, topic))
+        if handler is None:
+            def handler(message):
+                callback = self.subscriptions.get(topic)
+                if callback is not None:
+                    callback(name, message)
+
+            self._handlers[(name, topic)] = handler
+        self.connections[name].datachannel.pub_sub.subscribe(topic, handler)
+
+    def subscribe(self, topic, callback):
+        """
+        Subscribe every connected robot to a topic.
+
+        The subscription is also applied to robots connected later through
+        connect_all().
+
+        :param callback: Called as callback(robot_name, message).
+        """
+        self.subscriptions[topic] = callback
+        for name in self.connected():
+            self._subscribe_one(name, topic)
+
+    def unsubscribe(self, topic):
+        self.subscriptions.pop(topic, None)
+        connected = self.connected()
+        for name in list(self.connections):
+            handler = self._handlers.pop((name, topic), None)
+            if handler is not None and name in connected:
+                self.connections[name].datachannel.pub_sub.unsubscribe(topic, handler)
+
+    def publish_without_callback(self, topic, data=None, msg_type=None, robots=None):
+        """Publish a message to all (or the given) connected robots without waiting for replies."""
+        for conn in self._targets(robots).values():
+            conn.datachannel.pub_sub.publish_without_callback(topic, data, msg_type)
+
+    async def _gather(self, robots, make_request, timeout):
+        targets = self._targets(robots)
+
+        async def run(conn):
+            return await asyncio.wait_for(make_request(conn.datachannel.pub_sub), timeout)
+
+        results = await asyncio.gather(*(run(conn) for conn in targets.values()), return_exceptions=True)
+        return dict(zip(targets, results))
+
+    async def publish(self, topic, data=None, msg_type=None, robots=None, timeout=None):
+        """
+        Publish a message to all (or the given) connected robots concurrently.
+
+        :return: dict of robot name -> response, or the exception raised for that robot.
+        """
+        return await self._gather(robots, lambda pub_sub: pub_sub.publish(topic, data, msg_type), timeout)
+
+    async def publish_request_new(self, topic, options=None, robots=None, timeout=None):
+        """
+        Send the same API request to all (or the given) connected robots concurrently.
+
+        :return: dict of robot name -> response, or the exception raised for that robot.
+        """
+        return await self._gather(robots, lambda pub_sub: pub_sub.publish_request_new(topic, options), timeout)
@@ -0,0 +1,214 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import pickle
+import queue
+
+from .constants import RTC_TOPIC
+from .shm_ring import SharedMemoryRing
+
+# Ring sizes (slots, slot_size) derived from a robot's topics. Pickled state
+# messages are a few KB; decoded LiDAR frames are up to about 1.5 MB.
+_MESSAGE_RING = (64, 64 << 10)
+_LIDAR_RING = (8, 2 << 20)
+_LIDAR_TOPICS = {
+    RTC_TOPIC["ULIDAR"],
+    RTC_TOPIC["ULIDAR_ARRAY"],
+    RTC_TOPIC["LIDAR_MAPPING_CLOUD_POINT"],
+    RTC_TOPIC["LIDAR_LOCALIZATION_CLOUD_POINT"],
+}
+
+
+def _worker_main(robots, ring_names, commands, events):
+    """Entry point of a worker process: runs a Fleet with its share of robots."""
+    try:
+        asyncio.run(_worker(robots, ring_names, commands, events))
+    except KeyboardInterrupt:
+        pass
+
+
+async def _worker(robots, ring_names, commands, events):
+    # Imported here so the parent process does not load aiortc just to supervise
+    from .fleet import Fleet
+
+    fleet = Fleet()
+    rings = {name: SharedMemoryRing.attach(ring_name) for name, ring_name in ring_names.items()}
+
+    def make_writer(name, topic):
+        ring = rings[name]
+
+        def on_message(message):
+            try:
+                ring.write(pickle.dumps((topic, message), protocol=pickle.HIGHEST_PROTOCOL))
+            except ValueError as e:
+                logging.warning(f"Dropping {topic} message from {name}: {e} (raise FleetSupervisor slot_size)")
+
+        return on_message
+
+    for name, (connectionMethod, kwargs, _) in robots.items():
+        fleet.add_robot(name, connectionMethod, **kwargs)
+
+    results = await fleet.connect_all()
+    for name, error in results.items():
+        events.put((name, "connected" if error is None else "failed", None if error is None else str(error)))
+        if error is None:
+            for topic in robots[name][2]:
+                fleet[name].datachannel.pub_sub.subscribe(topic, make_writer(name, topic))
+
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            command = await loop.run_in_executor(None, commands.get)
+            if command is None:
+                break
+            name, topic, data, msg_type = command
+            try:
+                fleet.publish_without_callback(topic, data, msg_type, robots=[name] if name else None)
+            except Exception as e:
+                logging.error(f"Failed to publish {topic} to {name or 'fleet'}: {e}")
+    finally:
+        await fleet.disconnect_all()
+        fleet.close()
+        for ring in rings.values():
+            ring.close()
+
+
+class FleetSupervisor:
+    """
+    Spreads robot connections over worker processes, one event loop per core.
+
+    aiortc's DTLS/SRTP/SCTP stack and the LiDAR decoders are CPU bound and
+    hold the GIL, so a single process saturates after a few streaming robots.
+    Each worker runs a Fleet for its share of the robots and writes every
+    message of the subscribed topics, already decoded, into a per-robot
+    SharedMemoryRing that the parent reads without going through a pipe.
+
+    Rings live in /dev/shm, which Docker limits to 64 MB by default. Unless
+    given, ring sizes follow the robot's topics: 4 MB for state topics, 16 MB
+    when a LiDAR topic is forwarded. Raise the limit (docker run --shm-size)
+    for larger fleets or rings.
+    """
+
+    def __init__(self, processes=None, slots=None, slot_size=None):
+        """
+        :param processes: Number of worker processes, defaults to the CPU count.
+        :param slots: Messages kept per robot ring, derived from the topics by default.
+        :param slot_size: Maximum size of one pickled message in bytes, derived from the topics by default.
+        """
+        self.processes = processes or os.cpu_count() or 1
+        self.slots = slots
+        self.slot_size = slot_size
+        self.robots = {}
+        self.rings = {}
+        self.status = {}
+        self._cursors = {}
+        self._latest = {}
+        self._workers = []
+        self._commands = []
+        self._placement = {}
+        self._ctx = multiprocessing.get_context("spawn")
+        self._events = None
+
+    def add_robot(self, name, connectionMethod, topics=(), **kwargs):
+        """
+        Register a robot before start().
+
+        :param topics: Topics to subscribe to and forward to the parent.
+        :param kwargs: Go2WebRTCConnection arguments (serialNumber, ip, ...).
+        """
+        if self._workers:
+            raise RuntimeError("Robots must be added before start()")
+        if name in self.robots:
+            raise ValueError(f"Robot '{name}' is already registered")
+        self.robots[name] = (connectionMethod, kwargs, list(topics))
+
+    def start(self):
+        """Create the rings and spawn the worker processes."""
+        self._events = self._ctx.Queue()
+        shards = [{} for _ in range(min(self.processes, len(self.robots)) or 1)]
+        for i, (name, spec) in enumerate(self.robots.items()):
+            shards[i % len(shards)][name] = spec
+            self._placement[name] = i % len(shards)
+            slots, slot_size = self._ring_size(spec[2])
+            self.rings[name] = SharedMemoryRing(slots=slots, slot_size=slot_size)
+            self._cursors[name] = 0
+            self.status[name] = "connecting"
+
+        for shard in shards:
+            commands = self._ctx.Queue()
+            ring_names = {name: self.rings[name].name for name in shard}
+            worker = self._ctx.Process(
+                target=_worker_main,
+                args=(shard, ring_names, commands, self._events),
+                daemon=True,
+            )
+            worker.start()
+            self._workers.append(worker)
+            self._commands.append(commands)
+
+    def _ring_size(self, topics):
+        """(slots, slot_size) of the ring of a robot forwarding `topics`."""
+        slots, slot_size = _LIDAR_RING if _LIDAR_TOPICS.intersection(topics) else _MESSAGE_RING
+        return self.slots or slots, self.slot_size or slot_size
+
+    def stop(self, timeout=10):
+        """Ask every worker to disconnect, then release the rings."""
+        for commands in self._commands:
+            commands.put(None)
+        for worker in self._workers:
+            worker.join(timeout)
+            if worker.is_alive():
+                worker.terminate()
+        self._workers.clear()
+        self._commands.clear()
+        for ring in self.rings.values():
+            ring.close()
+            ring.unlink()
+        self.rings.clear()
+
+    def poll_status(self):
+        """Apply pending connection events from the workers and return the status of every robot."""
+        while True:
+            try:
+                name, state, error = self._events.get_nowait()
+            except queue.Empty:
+                break
+            self.status[name] = state
+            if error:
+                logging.error(f"Robot {name} failed to connect: {error}")
+        return dict(self.status)
+
+    def read(self, name):
+        """
+        Return the (topic, message) pairs received from a robot since the last read.
+
+        Messages older than the ring capacity are dropped if the parent falls behind.
+        """
+        payloads, self._cursors[name] = self.rings[name].read_since(self._cursors[name])
+        messages = [pickle.loads(payload) for _, payload in payloads]
+        for topic, message in messages:
+            self._latest[(name, topic)] = message
+        return messages
+
+    def latest(self, name, topic):
+        """Most recent message of a topic from a robot, reading any pending ones first."""
+        self.read(name)
+        return self._latest.get((name, topic))
+
+    def publish_without_callback(self, topic, data=None, msg_type=None, robot=None):
+        """
+        Publish a message through the worker owning the robot, or to every robot.
+        """
+        if robot is None:
+            for commands in self._commands:
+                commands.put((None, topic, data, msg_type))
+        else:
+            self._commands[self._placement[robot]].put((robot, topic, data, msg_type))
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -21,23 +21,156 @@
 
 import math
 import ctypes
+import hashlib
+import logging
 import numpy as np
 import os
+import platform
+import threading
 
 from wasmtime import Config, Engine, Store, Module, Instance, Func, FuncType
 from wasmtime import ValType
 
+WASM_PATH = os.path.join(os.path.dirname(__file__), "libvoxel.wasm")
+
+# Engines and compiled modules are shared by every decoder in the process,
+# keyed by the debug_info setting they were compiled with
+_engines = {}
+_modules = {}
+_lock = threading.Lock()
+
+
+def get_cache_dir():
+    """
+    Directory holding precompiled libvoxel modules.
+
+    Defaults to ~/.cache/go2_webrtc_driver and can be overridden with the
+    GO2_WEBRTC_CACHE_DIR environment variable.
+    """
+    return os.environ.get("GO2_WEBRTC_CACHE_DIR") or os.path.join(
+        os.path.expanduser("~"), ".cache", "go2_webrtc_driver"
+    )
+
+
+def _wasmtime_version():
+    try:
+        from importlib.metadata import version
+        return version("wasmtime")
+    except Exception:
+        return "unknown"
 
-class LidarDecoder:
-    def __init__(self) -> None:
 
+def _get_engine(debug_info):
+    engine = _engines.get(debug_info)
+    if engine is None:
         config = Config()
         config.wasm_multi_value = True
-        config.debug_info = True
-        self.store = Store(Engine(config))
+        config.debug_info = debug_info
+        engine = _engines[debug_info] = Engine(config)
+    return engine
+
+
+def _compile_module(engine, debug_info, use_cache):
+    with open(WASM_PATH, "rb") as f:
+        wasm = f.read()
+
+    if not use_cache:
+        return Module(engine, wasm)
+
+    # Serialized modules are only valid for the same wasm binary, wasmtime
+    # release, host architecture and engine configuration
+    key = hashlib.sha256()
+    key.update(wasm)
+    key.update(f"{_wasmtime_version()}|{platform.machine()}|debug={debug_info}".encode())
+    cache_path = os.path.join(get_cache_dir(), f"libvoxel-{key.hexdigest()[:32]}.cwasm")
+
+    if os.path.exists(cache_path):
+        try:
+            return Module.deserialize_file(engine, cache_path)
+        except Exception as e:
+            logging.warning(f"Ignoring unusable libvoxel cache {cache_path}: {e}")
+
+    module = Module(engine, wasm)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        # Serialize before creating the file, so a failure leaves nothing behind
+        data = module.serialize()
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, cache_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+    except Exception as e:
+        logging.warning(f"Could not write libvoxel cache {cache_path}: {e}")
+    return module
+
 
-        wasm_path = os.path.join(os.path.dirname(__file__), "libvoxel.wasm")
-        self.module = Module.from_file(self.store.engine, wasm_path)
+def get_module(debug_info=False, use_cache=True):
+    """
+    Return the shared engine and compiled libvoxel module.
+
+    The module is compiled at most once per process and, when use_cache is
+    set, loaded from the on-disk cache instead of being recompiled.
+    """
+    with _lock:
+        engine = _get_engine(debug_info)
+        module = _modules.get(debug_info)
+        if module is None:
+            module = _modules[debug_info] = _compile_module(engine, debug_info, use_cache)
+        return engine, module
+
+
+def unique_vertices(positions, indices=None):
+    """
+    Deduplicate the vertices of a libvoxel mesh.
+
+    Coordinates are uint8 grid units, so every vertex packs into one 24 bit
+    key and a 1-D np.unique replaces the row-wise np.unique(axis=0).
+
+    :param positions: Flat uint8 positions (x, y, z per vertex).
+    :param indices: Optional uint32 triangle indices into positions, remapped to the unique vertices.
+    :return: (M, 3) uint8 unique vertices, and the remapped (K, 3) triangles if indices were given.
+    """
+    vertices = positions.reshape(-1, 3)
+    keys = (vertices[:, 0].astype(np.uint32) << 16) | (vertices[:, 1].astype(np.uint32) << 8) | vertices[:, 2]
+    if indices is None:
+        keys = np.unique(keys)
+    else:
+        keys, inverse = np.unique(keys, return_inverse=True)
+    unique = np.empty((len(keys), 3), dtype=np.uint8)
+    unique[:, 0] = keys >> 16
+    unique[:, 1] = (keys >> 8) & 0xFF
+    unique[:, 2] = keys & 0xFF
+    if indices is None:
+        return unique
+    return unique, inverse.reshape(-1).astype(np.uint32)[indices].reshape(-1, 3)
+
+
+def add_unique_vertices(result, unique_points=False, indexed_mesh=False):
+    """
+    Add deduplicated outputs to a libvoxel decode result, in place.
+
+    :param unique_points: Add "unique_positions", the (M, 3) uint8 vertices without duplicates.
+    :param indexed_mesh: Add "vertices" (unique, (M, 3) uint8) and "triangles"
+        ((K, 3) uint32 indices into them), a compact version of the mesh.
+    """
+    if indexed_mesh:
+        result["vertices"], result["triangles"] = unique_vertices(result["positions"], result["indices"])
+        if unique_points:
+            result["unique_positions"] = result["vertices"]
+    elif unique_points:
+        result["unique_positions"] = unique_vertices(result["positions"])
+    return result
+
+
+class LidarDecoder:
+    def __init__(self, debug_info=False, use_cache=True) -> None:
+
+        engine, self.module = get_module(debug_info, use_cache)
+        self.store = Store(engine)
 
         self.a_callback_type = FuncType([ValType.i32()], [ValType.i32()])
         self.b_callback_type = FuncType([ValType.i32(), ValType.i32(), ValType.i32()], [])
@@ -75,6 +208,7 @@ class LidarDecoder:
         self.faceCount = self.malloc(self.store, 4)
         self.pointCount = self.malloc(self.store, 4)
         self.decompressBufferSize = 80000
+        self.last_bitmap = None
 
     def adjust_memory_size(self, t):
         return len(self.HEAPU8)
@@ -111,11 +245,15 @@ class LidarDecoder:
         
     def add_value_arr(self, start, value):
         if start + len(value) <= len(self.HEAPU8):
-            for i, byte in enumerate(value):
-                self.HEAPU8[start + i] = byte
+            ctypes.memmove(self.buffer_ptr + start, bytes(value), len(value))
         else:
             raise ValueError("Not enough space to insert bytes at the specified index.")
 
+    def decode_bitmap(self, compressed_data, data):
+        """Occupancy bitmap of a frame; libvoxel always meshes it as well."""
+        self.decode(compressed_data, data)
+        return self.last_bitmap
+
     def decode(self, compressed_data, data):
         self.add_value_arr(self.input, compressed_data)
 
@@ -136,21 +274,19 @@ class LidarDecoder:
             some_v
         )
 
-        self.get_value(self.decompressedSize, "i32")
         c = self.get_value(self.pointCount, "i32")
         u = self.get_value(self.faceCount, "i32")
 
-        positions_slice = self.HEAPU8[self.positions:self.positions + u * 12]
-        positions_copy = bytearray(positions_slice)
-        p = np.frombuffer(positions_copy, dtype=np.uint8)
-
-        uvs_slice = self.HEAPU8[self.uvs:self.uvs + u * 8]
-        uvs_copy = bytearray(uvs_slice)
-        r = np.frombuffer(uvs_copy, dtype=np.uint8)
+        # Copy the outputs out of WASM memory, the next frame overwrites them
+        p = np.frombuffer(self.HEAPU8, dtype=np.uint8, count=u * 12, offset=self.positions).copy()
+        r = np.frombuffer(self.HEAPU8, dtype=np.uint8, count=u * 8, offset=self.uvs).copy()
+        o = np.frombuffer(self.HEAPU8, dtype=np.uint32, count=u * 6, offset=self.indices).copy()
 
-        indices_slice = self.HEAPU8[self.indices:self.indices + u * 24]
-        indices_copy = bytearray(indices_slice)
-        o = np.frombuffer(indices_copy, dtype=np.uint32)
+        # The WASM decompresses the frame into decompressBuffer before meshing it
+        decompressed_size = self.get_value(self.decompressedSize, "i32")
+        self.last_bitmap = np.frombuffer(
+            self.HEAPU8, dtype=np.uint8, count=decompressed_size, offset=self.decompressBuffer
+        ).copy()
 
         return {
             "point_count": c,
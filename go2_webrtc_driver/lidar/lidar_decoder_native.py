@@ -30,28 +30,26 @@ def decompress(compressed_data, decomp_size):
     return decompressed
 
 def bits_to_points(buf, origin, resolution=0.05):
-    buf = np.frombuffer(bytearray(buf), dtype=np.uint8)
-    nonzero_indices = np.nonzero(buf)[0]
-    points = []
+    buf = np.frombuffer(buf, dtype=np.uint8)
+    # One bit per voxel, MSB first: x within 16 bytes, 128 rows of y, then z slices
+    indices = np.flatnonzero(np.unpackbits(buf))
+    x = indices % 0x80
+    y = (indices // 0x80) % 0x80
+    z = indices // 0x4000
+    return np.stack((x, y, z), axis=1) * resolution + origin
 
-    for n in nonzero_indices:
-        byte_value = buf[n]
-        z = n // 0x800
-        n_slice = n % 0x800
-        y = n_slice // 0x10
-        x_base = (n_slice % 0x10) * 8
-
-        for bit_pos in range(8):
-            if byte_value & (1 << (7 - bit_pos)):
-                x = x_base + bit_pos
-                points.append((x,y,z))
+class LidarDecoder:
+    def __init__(self):
+        self.last_bitmap = None
 
-    return np.array(points) * resolution + origin
+    def decode_bitmap(self, compressed_data, data):
+        """Decompress a frame to its occupancy bitmap without building points."""
+        self.last_bitmap = np.frombuffer(decompress(compressed_data, data["src_size"]), dtype=np.uint8)
+        return self.last_bitmap
 
-class LidarDecoder:
     def decode(self, compressed_data, data):
         def points():
-            decompressed = decompress(compressed_data, data["src_size"])
+            decompressed = self.decode_bitmap(compressed_data, data)
             points = bits_to_points(decompressed, data["origin"], data["resolution"])
             return points
 
@@ -1,33 +1,73 @@
-from .lidar_decoder_libvoxel import LidarDecoder as LibVoxelDecoder
-from .lidar_decoder_native import LidarDecoder as NativeDecoder
-
-
 class UnifiedLidarDecoder:
-    def __init__(self, decoder_type="libvoxel"):
+    def __init__(self, decoder_type="libvoxel", pipeline=None):
         """
         Initialize the UnifiedLidarDecoder with the specified decoder type.
 
         :param decoder_type: The type of decoder to use ("libvoxel" or "native").
                              Defaults to "libvoxel".
+        :param pipeline: Optional LidarPipeline run on every decoded frame.
         """
+        self.pipeline = pipeline
+        # The backends are imported on demand so that wasmtime, lz4 and numpy
+        # are only loaded by processes that actually decode LiDAR data
         if decoder_type == "libvoxel":
+            from .lidar_decoder_libvoxel import LidarDecoder as LibVoxelDecoder
             self.decoder = LibVoxelDecoder()
             self.decoder_name = "LibVoxelDecoder"
         elif decoder_type == "native":
+            from .lidar_decoder_native import LidarDecoder as NativeDecoder
             self.decoder = NativeDecoder()
             self.decoder_name = "NativeDecoder"
         else:
             raise ValueError("Invalid decoder type. Choose 'libvoxel' or 'native'.")
 
-    def decode(self, compressed_data, metadata):
+    def set_pipeline(self, height_band=None, crop=None, voxel_size=None, transform=None):
+        """
+        Filter every decoded frame; see LidarPipeline for the stages.
+
+        With a pipeline the result holds the filtered "points" (metres), built
+        straight from the occupancy bitmap; the libvoxel mesh is still returned
+        unfiltered next to them. Call without arguments to remove it.
+        """
+        from .lidar_pipeline import LidarPipeline
+
+        stages = (height_band, crop, voxel_size, transform)
+        self.pipeline = None if all(stage is None for stage in stages) else LidarPipeline(*stages)
+        return self.pipeline
+
+    def decode(self, compressed_data, metadata, pipeline=None):
         """
         Decode the compressed data using the selected decoder.
 
         :param compressed_data: The compressed data to decode.
         :param metadata: Metadata required for decoding (e.g., origin, resolution).
+        :param pipeline: LidarPipeline overriding the decoder's own for this frame.
         :return: Decoded result from the selected decoder.
         """
-        return self.decoder.decode(compressed_data, metadata)
+        pipeline = pipeline or self.pipeline
+        if pipeline is None:
+            return self.decoder.decode(compressed_data, metadata)
+
+        if self.decoder_name == "NativeDecoder":
+            # The unfiltered points are never built
+            result = {}
+            bitmap = self.decoder.decode_bitmap(compressed_data, metadata)
+        else:
+            result = self.decoder.decode(compressed_data, metadata)
+            bitmap = self.decoder.last_bitmap
+        result["points"] = pipeline.bitmap_to_points(bitmap, metadata["origin"], metadata["resolution"])
+        return result
+
+    def decode_bitmap(self, compressed_data, metadata):
+        """
+        Decompress a frame to its voxel occupancy bitmap.
+
+        One bit per voxel, MSB first, in x, then y (128 per row), then z
+        slices of 128x128, as produced by the robot.
+
+        :return: uint8 numpy array, owned by the caller.
+        """
+        return self.decoder.decode_bitmap(compressed_data, metadata)
 
     def get_decoder_name(self):
         """
@@ -35,4 +75,26 @@ class UnifiedLidarDecoder:
 
         :return: Name of the decoder (e.g., "LibVoxelDecoder" or "NativeDecoder").
         """
-        return self.decoder_name
\ No newline at end of file
+        return self.decoder_name
+
+class LidarDecoderPool:
+    """
+    Shares one UnifiedLidarDecoder per decoder type between connections.
+
+    Decoding runs synchronously on the event loop thread, so every connection
+    on the same loop can safely use the same decoder instance instead of
+    building (and holding the WASM memory of) its own.
+    """
+
+    def __init__(self):
+        self.decoders = {}
+
+    def get(self, decoder_type="libvoxel"):
+        """
+        Return the shared decoder for the given type, creating it on first use.
+
+        :param decoder_type: The type of decoder to use ("libvoxel" or "native").
+        """
+        if decoder_type not in self.decoders:
+            self.decoders[decoder_type] = UnifiedLidarDecoder(decoder_type=decoder_type)
+        return self.decoders[decoder_type]
@@ -0,0 +1,136 @@
+import numpy as np
+
+# The voxel map is sent as slices of 128 x 128 voxels, one bit per voxel
+GRID_SIZE = 128
+SLICE_BYTES = GRID_SIZE * GRID_SIZE // 8
+
+
+def indices_to_grid(indices):
+    """Bit indices of a voxel bitmap as an (N, 3) int array of (x, y, z) voxel coordinates."""
+    indices = np.asarray(indices, dtype=np.int64)
+    grid = np.empty((len(indices), 3), dtype=np.int64)
+    grid[:, 0] = indices % GRID_SIZE
+    grid[:, 1] = (indices // GRID_SIZE) % GRID_SIZE
+    grid[:, 2] = indices // (GRID_SIZE * GRID_SIZE)
+    return grid
+
+
+def indices_to_points(indices, origin, resolution=0.05):
+    """Bit indices of a voxel bitmap as (N, 3) points in metres, like the native decoder's output."""
+    return indices_to_grid(indices) * resolution + np.asarray(origin)
+
+
+class LidarDeltaTracker:
+    """
+    Turns consecutive voxel map frames into added and removed voxels.
+
+    Keeps the previous frame's occupancy bitmap and XORs it with the new one;
+    only the bytes that changed are unpacked, so a mostly static scene costs
+    a few microseconds. When the map origin moves by whole voxels the previous
+    bitmap is shifted into the new grid first, so moving the robot does not
+    turn every voxel into a change. If the grid changed in any other way
+    (resolution, height, fractional shift) the frame is reported as a reset.
+
+    Each tracker holds the state of one stream; give every connection its own.
+    """
+
+    def __init__(self, full_frames=False):
+        """
+        :param full_frames: Decode the full frame (points or mesh) as well as the delta.
+        """
+        self.full_frames = full_frames
+        self.frames = 0
+        self.resets = 0
+        self._bitmap = None
+        self._origin = None
+        self._resolution = None
+
+    def reset(self):
+        """Forget the previous frame; the next one is reported in full."""
+        self._bitmap = None
+
+    def decode(self, decoder, compressed_data, metadata, pipeline=None):
+        """
+        Decode a voxel map message with a UnifiedLidarDecoder and add its delta.
+
+        :param pipeline: LidarPipeline for the full frame; the delta is never filtered.
+        :return: The decoder's result (empty unless full_frames) with a "delta" entry.
+        """
+        if self.full_frames:
+            result = decoder.decode(compressed_data, metadata, pipeline)
+            bitmap = decoder.decoder.last_bitmap
+        else:
+            result = {}
+            bitmap = decoder.decode_bitmap(compressed_data, metadata)
+        result["delta"] = self.update(bitmap, metadata["origin"], metadata["resolution"])
+        return result
+
+    def update(self, bitmap, origin, resolution):
+        """
+        Compare a frame's bitmap with the previous frame.
+
+        :param bitmap: Decompressed occupancy bitmap (bytes or uint8 array).
+        :return: dict with "added" and "removed" bit indices into the new
+            frame's grid, "reset" (True when "added" holds every occupied
+            voxel and "removed" is empty), and the frame's "origin" and
+            "resolution" to map indices to points with indices_to_points().
+        """
+        bitmap = np.frombuffer(bitmap, dtype=np.uint8) if isinstance(bitmap, (bytes, bytearray)) else bitmap
+        origin = np.asarray(origin, dtype=np.float64)
+        previous = self._aligned_previous(bitmap, origin, resolution)
+        self.frames += 1
+        self._bitmap = bitmap.copy()
+        self._origin = origin
+        self._resolution = resolution
+
+        if previous is None:
+            self.resets += 1
+            added = np.flatnonzero(np.unpackbits(bitmap))
+            return self._delta(added, np.empty(0, dtype=np.int64), True, origin, resolution)
+
+        diff = np.bitwise_xor(previous, bitmap)
+        changed = np.flatnonzero(diff)
+        if not len(changed):
+            empty = np.empty(0, dtype=np.int64)
+            return self._delta(empty, empty, False, origin, resolution)
+
+        # Unpack just the changed bytes; a set bit of the new frame marks an addition
+        rows, bits = np.nonzero(np.unpackbits(diff[changed][:, None], axis=1))
+        indices = changed[rows] * 8 + bits
+        is_set = np.unpackbits(bitmap[changed][:, None], axis=1)[rows, bits].astype(bool)
+        return self._delta(indices[is_set], indices[~is_set], False, origin, resolution)
+
+    @staticmethod
+    def _delta(added, removed, reset, origin, resolution):
+        return {
+            "added": added,
+            "removed": removed,
+            "reset": reset,
+            "origin": origin,
+            "resolution": resolution,
+        }
+
+    def _aligned_previous(self, bitmap, origin, resolution):
+        """Previous bitmap expressed in the new frame's grid, or None if that is not possible."""
+        previous = self._bitmap
+        if previous is None or len(previous) != len(bitmap) or resolution != self._resolution:
+            return None
+        if len(bitmap) % SLICE_BYTES:
+            return None
+
+        offset = (origin - self._origin) / resolution
+        shift = np.round(offset).astype(int)
+        if np.any(np.abs(offset - shift) > 1e-3):
+            return None
+        if not shift.any():
+            return previous
+
+        depth = len(bitmap) // SLICE_BYTES
+        old = np.unpackbits(previous).reshape(depth, GRID_SIZE, GRID_SIZE)
+        aligned = np.zeros_like(old)
+        # A voxel at old grid position p sits at p - shift in the new grid
+        dx, dy, dz = shift
+        src = tuple(slice(max(d, 0), n + min(d, 0)) for d, n in zip((dz, dy, dx), old.shape))
+        dst = tuple(slice(max(-d, 0), n - max(d, 0)) for d, n in zip((dz, dy, dx), old.shape))
+        aligned[dst] = old[src]
+        return np.packbits(aligned.reshape(-1))
@@ -0,0 +1,94 @@
+import numpy as np
+
+from .lidar_delta import GRID_SIZE, SLICE_BYTES
+
+
+class LidarPipeline:
+    """
+    Filtering stages applied to a voxel map frame while it is decoded.
+
+    The height band and crop box are applied to the occupancy bitmap: only
+    the z slices inside them are unpacked and only the cropped sub-grid is
+    searched for voxels. Downsampling pools the grid in blocks of whole
+    voxels, so no point is created for the voxels it merges. The transform
+    runs last, on the remaining points.
+
+    Bounds are in metres in the frame the voxel map is in (odom), before the
+    transform.
+    """
+
+    def __init__(self, height_band=None, crop=None, voxel_size=None, transform=None):
+        """
+        :param height_band: (min_z, max_z) in metres, None to keep every height.
+        :param crop: ((min_x, min_y, min_z), (max_x, max_y, max_z)) in metres, None for no crop.
+        :param voxel_size: Output voxel size in metres, rounded to a multiple of
+            the map resolution; each occupied block becomes one point at its centre.
+        :param transform: 4x4 homogeneous or 3x3 rotation matrix applied to the points.
+        """
+        self.height_band = height_band
+        self.crop = crop
+        self.voxel_size = voxel_size
+        self.transform = None if transform is None else np.asarray(transform, dtype=np.float64)
+
+    def _grid_bounds(self, origin, resolution, depth):
+        """Sub-grid (lower, upper) voxel indices in (x, y, z) order selected by the crop and height band."""
+        lower = np.zeros(3, dtype=np.int64)
+        upper = np.array([GRID_SIZE, GRID_SIZE, depth], dtype=np.int64)
+        boxes = []
+        if self.crop is not None:
+            boxes.append((np.asarray(self.crop[0], dtype=np.float64), np.asarray(self.crop[1], dtype=np.float64)))
+        if self.height_band is not None:
+            boxes.append((np.array([-np.inf, -np.inf, self.height_band[0]]),
+                          np.array([np.inf, np.inf, self.height_band[1]])))
+        for low, high in boxes:
+            with np.errstate(invalid="ignore"):
+                # Voxels whose centre lies inside [low, high]
+                first = np.ceil((low - origin) / resolution - 1e-9)
+                last = np.floor((high - origin) / resolution + 1e-9) + 1
+            first = np.where(np.isfinite(first), first, 0).astype(np.int64)
+            last = np.where(np.isfinite(last), last, upper).astype(np.int64)
+            lower = np.maximum(lower, first)
+            upper = np.minimum(upper, last)
+        return lower, np.maximum(upper, lower)
+
+    def bitmap_to_points(self, bitmap, origin, resolution):
+        """
+        Run the pipeline on a decompressed occupancy bitmap.
+
+        :return: (N, 3) float64 points.
+        """
+        bitmap = np.frombuffer(bitmap, dtype=np.uint8) if isinstance(bitmap, (bytes, bytearray)) else bitmap
+        origin = np.asarray(origin, dtype=np.float64)
+        depth = len(bitmap) // SLICE_BYTES
+        lower, upper = self._grid_bounds(origin, resolution, depth)
+        if np.any(upper <= lower):
+            return self._transform(np.empty((0, 3)))
+
+        # Unpack only the z slices in range, then view the cropped sub-grid
+        slices = bitmap[lower[2] * SLICE_BYTES:upper[2] * SLICE_BYTES]
+        grid = np.unpackbits(slices).reshape(-1, GRID_SIZE, GRID_SIZE)
+        grid = grid[:, lower[1]:upper[1], lower[0]:upper[0]]
+
+        factor = 1
+        if self.voxel_size is not None:
+            factor = max(1, int(round(self.voxel_size / resolution)))
+        if factor > 1:
+            # Max-pool the grid in factor^3 blocks
+            pad = [(0, -n % factor) for n in grid.shape]
+            grid = np.pad(grid, pad)
+            z, y, x = (n // factor for n in grid.shape)
+            grid = grid.reshape(z, factor, y, factor, x, factor).any(axis=(1, 3, 5))
+
+        z, y, x = np.nonzero(grid)
+        cells = np.stack((x, y, z), axis=1).astype(np.float64)
+        # Block centres in voxel units, relative to the sub-grid corner
+        cells = cells * factor + (factor - 1) / 2.0
+        points = (cells + lower) * resolution + origin
+        return self._transform(points)
+
+    def _transform(self, points):
+        if self.transform is None:
+            return points
+        if self.transform.shape == (4, 4):
+            return points @ self.transform[:3, :3].T + self.transform[:3, 3]
+        return points @ self.transform.T
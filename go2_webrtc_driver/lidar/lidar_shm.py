@@ -0,0 +1,194 @@
+import time
+import numpy as np
+from multiprocessing import shared_memory
+
+from ..constants import RTC_TOPIC
+from ..shm_ring import attach_shared_memory
+
+# Header: frames published, index of the buffer holding the latest frame, capacity in points
+_HEADER_DTYPE = np.dtype([("seq", "<u8"), ("active", "<u4"), ("max_points", "<u4")])
+_HEADER_SIZE = 64
+
+# Per buffer header. frame_seq is odd while the buffer is being written
+_BUFFER_HEADER_DTYPE = np.dtype([
+    ("frame_seq", "<u8"),
+    ("count", "<u4"),
+    ("kind", "<u4"),
+    ("origin", "<f8", (3,)),
+    ("resolution", "<f8"),
+    ("stamp", "<f8"),
+])
+_BUFFER_HEADER_SIZE = 64
+
+# What the published coordinates are
+POINTS_WORLD = 0  # native decoder "points", metres in the odom frame
+POINTS_GRID = 1  # libvoxel "positions", voxel grid units
+
+
+def _buffer_size(max_points):
+    return _BUFFER_HEADER_SIZE + max_points * 3 * 4
+
+
+class _LidarSharedMemory:
+    def __init__(self, shm, max_points):
+        self.shm = shm
+        self.name = shm.name
+        self.max_points = max_points
+        self.header = np.ndarray((), dtype=_HEADER_DTYPE, buffer=shm.buf, offset=0)
+        self.buffer_headers = []
+        self.buffer_points = []
+        for i in range(2):
+            offset = _HEADER_SIZE + i * _buffer_size(max_points)
+            self.buffer_headers.append(np.ndarray((), dtype=_BUFFER_HEADER_DTYPE, buffer=shm.buf, offset=offset))
+            self.buffer_points.append(np.ndarray(
+                (max_points, 3), dtype=np.float32, buffer=shm.buf, offset=offset + _BUFFER_HEADER_SIZE
+            ))
+
+    def close(self):
+        # Drop the numpy views first, SharedMemory.close() fails while they exist
+        self.header = None
+        self.buffer_headers = []
+        self.buffer_points = []
+        self.shm.close()
+
+
+class LidarSharedMemoryPublisher(_LidarSharedMemory):
+    """
+    Publishes decoded LiDAR frames into a shared memory double buffer.
+
+    Each frame is written into the buffer that does not hold the latest
+    frame, then the buffers are swapped and the sequence counter bumped, so
+    any number of local processes can map the latest frame with
+    LidarSharedMemoryReader without copying it and without locks.
+    """
+
+    def __init__(self, name="go2_lidar", max_points=200000):
+        """
+        :param name: Name of the shared memory block readers attach to.
+        :param max_points: Capacity of each buffer; larger frames are truncated.
+        """
+        size = _HEADER_SIZE + 2 * _buffer_size(max_points)
+        super().__init__(shared_memory.SharedMemory(name=name, create=True, size=size), max_points)
+        self.header["seq"] = 0
+        self.header["active"] = 0
+        self.header["max_points"] = max_points
+
+    def attach(self, conn, topic=RTC_TOPIC["ULIDAR_ARRAY"]):
+        """
+        Subscribe to the voxel map topic of a connection and publish every frame.
+        """
+        conn.datachannel.pub_sub.subscribe(topic, self.publish_message)
+
+    def publish_message(self, message):
+        """
+        Publish a decoded voxel map message as received from the data channel.
+
+        Delta-only frames (see enable_lidar_delta) carry no points and are skipped.
+
+        :return: Sequence number of the published frame, or None if it was skipped.
+        """
+        data = message["data"]
+        decoded = data["data"]
+        if "points" in decoded:
+            return self.publish(decoded["points"], data["origin"], data["resolution"], POINTS_WORLD, data.get("stamp"))
+        else:
+            positions = decoded.get("unique_positions")
+            if positions is None:
+                if "positions" not in decoded:
+                    return None
+                positions = np.asarray(decoded["positions"]).reshape(-1, 3)
+            return self.publish(positions, data["origin"], data["resolution"], POINTS_GRID, data.get("stamp"))
+
+    def publish(self, points, origin, resolution, kind=POINTS_WORLD, stamp=None):
+        """
+        Publish an (N, 3) array of points.
+
+        :return: Sequence number of the published frame.
+        """
+        points = np.asarray(points).reshape(-1, 3)
+        seq = int(self.header["seq"])
+        target = 1 - int(self.header["active"])
+        header = self.buffer_headers[target]
+        count = min(len(points), self.max_points)
+
+        header["frame_seq"] = 2 * seq + 1
+        self.buffer_points[target][:count] = points[:count]
+        header["count"] = count
+        header["kind"] = kind
+        header["origin"] = origin
+        header["resolution"] = resolution
+        header["stamp"] = time.time() if stamp is None else stamp
+        header["frame_seq"] = 2 * seq + 2
+
+        self.header["active"] = target
+        self.header["seq"] = seq + 1
+        return seq + 1
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+class LidarSharedMemoryReader(_LidarSharedMemory):
+    """
+    Reads the latest frame published by a LidarSharedMemoryPublisher.
+
+    Frames are returned as views into shared memory. A view stays valid until
+    the publisher starts writing the frame after next; check is_current()
+    after processing a frame, or pass copy=True, when that matters.
+    """
+
+    def __init__(self, name="go2_lidar"):
+        shm = attach_shared_memory(name)
+        max_points = int(np.ndarray((), dtype=_HEADER_DTYPE, buffer=shm.buf)["max_points"])
+        super().__init__(shm, max_points)
+
+    @property
+    def seq(self):
+        """Sequence number of the latest published frame, 0 before the first one."""
+        return int(self.header["seq"])
+
+    def latest(self, copy=False):
+        """
+        Return the latest frame as a dict, or None if nothing was published yet.
+
+        The dict holds seq, points (N, 3 float32), kind, origin, resolution and stamp.
+        """
+        for _ in range(3):
+            seq = int(self.header["seq"])
+            if seq == 0:
+                return None
+            index = int(self.header["active"])
+            header = self.buffer_headers[index]
+            if int(header["frame_seq"]) != 2 * seq:
+                # The publisher moved on between the two reads
+                continue
+            points = self.buffer_points[index][:int(header["count"])]
+            frame = {
+                "seq": seq,
+                "points": points.copy() if copy else points,
+                "kind": int(header["kind"]),
+                "origin": header["origin"].copy(),
+                "resolution": float(header["resolution"]),
+                "stamp": float(header["stamp"]),
+                "_buffer": index,
+            }
+            if int(header["frame_seq"]) == 2 * seq:
+                return frame
+        return None
+
+    def is_current(self, frame):
+        """Whether the shared buffer still holds the given frame (its views are intact)."""
+        return int(self.buffer_headers[frame["_buffer"]]["frame_seq"]) == 2 * frame["seq"]
+
+    def wait_for_frame(self, after_seq=0, timeout=None, poll_interval=0.001):
+        """
+        Block until a frame newer than `after_seq` is published.
+
+        :return: The frame, or None on timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.seq <= after_seq:
+            if deadline is not None and time.monotonic() > deadline:
+                return None
+            time.sleep(poll_interval)
+        return self.latest()
@@ -0,0 +1,225 @@
+import logging
+from collections import OrderedDict
+from itertools import chain
+
+import numpy as np
+
+from ..constants import RTC_TOPIC
+from ..util import get_nested_field
+from .lidar_delta import GRID_SIZE, SLICE_BYTES, indices_to_grid, indices_to_points
+
+# Tile coordinates are packed into 21 bits each to group voxels by tile
+_KEY_OFFSET = 1 << 20
+
+
+class VoxelMapAccumulator:
+    """
+    Fuses LiDAR frames into one sparse global voxel map.
+
+    Frames are local maps around the robot whose `origin` is in the odom
+    frame, so voxel (i, j, k) of a frame is global voxel
+    round(origin / resolution) + (i, j, k). The global map is stored as a
+    hash of dense tiles of `tile_size`^3 voxels, so memory grows with the area
+    explored rather than with its bounding box. Tiles are kept in LRU order
+    and the least recently observed ones are evicted beyond `max_tiles`;
+    with a robot position (set_robot_position() or attach_pose()) tiles
+    further than `max_distance` are dropped as well.
+
+    A full frame is authoritative for the box it covers: voxels inside it that
+    the frame does not report are cleared, so moving obstacles do not leave
+    trails. Point clouds from other sources can only add voxels.
+    """
+
+    def __init__(self, resolution=0.05, tile_size=32, max_tiles=4096, max_distance=None):
+        """
+        :param resolution: Voxel size in metres; frames at another resolution are resampled.
+        :param tile_size: Edge of a tile in voxels.
+        :param max_tiles: Tiles kept in memory, each tile_size^3 bytes.
+        :param max_distance: Metres from the robot beyond which tiles are dropped, None to keep them.
+        """
+        self.resolution = resolution
+        self.tile_size = tile_size
+        self.max_tiles = max_tiles
+        self.max_distance = max_distance
+        self.tiles = OrderedDict()
+        self.frames = 0
+        self.evicted = 0
+        self.robot_position = None
+
+    def __len__(self):
+        """Number of occupied voxels."""
+        return int(sum(np.count_nonzero(tile) for tile in self.tiles.values()))
+
+    def attach(self, conn, topic=RTC_TOPIC["ULIDAR_ARRAY"]):
+        """
+        Subscribe to the voxel map topic of a connection and fuse every frame.
+
+        Frames are fused from the LiDAR delta stream, since the libvoxel mesh
+        cannot be mapped back to voxels. If the connection has no delta stream
+        yet it is enabled with full frames, so other consumers of the topic
+        still receive points or meshes.
+        """
+        if conn.datachannel.lidar_delta is None:
+            conn.datachannel.enable_lidar_delta(full_frames=True)
+        conn.datachannel.pub_sub.subscribe(topic, self.add_message)
+
+    def attach_pose(self, conn, topic=RTC_TOPIC["ROBOTODOM"]):
+        """Follow the robot pose topic to evict tiles far from the robot."""
+        def on_pose(message):
+            position = get_nested_field(message, "data", "pose", "position")
+            if position:
+                self.set_robot_position((position["x"], position["y"], position["z"]))
+
+        conn.datachannel.pub_sub.subscribe(topic, on_pose)
+
+    def add_message(self, message):
+        """Fuse a decoded voxel map message as received from the data channel."""
+        data = message["data"]
+        decoded = data["data"]
+        if "delta" in decoded:
+            self.integrate_delta(decoded["delta"], data.get("src_size"))
+        elif "points" in decoded:
+            self.integrate_points(decoded["points"])
+        else:
+            logging.warning("VoxelMapAccumulator needs native points or the LiDAR delta stream")
+
+    def integrate_bitmap(self, bitmap, origin, resolution):
+        """Fuse a full frame given as its decompressed occupancy bitmap."""
+        bitmap = np.frombuffer(bitmap, dtype=np.uint8) if isinstance(bitmap, (bytes, bytearray)) else bitmap
+        indices = np.flatnonzero(np.unpackbits(bitmap))
+        self._integrate_frame(indices, None, True, origin, resolution, len(bitmap) // SLICE_BYTES)
+
+    def integrate_delta(self, delta, src_size=None):
+        """
+        Fuse a LidarDeltaTracker delta.
+
+        :param src_size: Size of the frame's bitmap, used to clear the whole frame box on resets.
+        """
+        depth = src_size // SLICE_BYTES if src_size else None
+        self._integrate_frame(delta["added"], delta["removed"], delta["reset"],
+                              delta["origin"], delta["resolution"], depth)
+
+    def integrate_points(self, points):
+        """Add (N, 3) points in metres; nothing is cleared."""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        self._set(np.floor(points / self.resolution + 0.5).astype(np.int64), True)
+        self.frames += 1
+        self._evict()
+
+    def _integrate_frame(self, added, removed, reset, origin, resolution, depth):
+        if not np.isclose(resolution, self.resolution):
+            # Another grid: fall back to adding the voxel centres as points
+            self.integrate_points(indices_to_points(added, origin, resolution))
+            return
+
+        base = np.round(np.asarray(origin, dtype=np.float64) / resolution).astype(np.int64)
+        if reset and depth:
+            self._clear_box(base, base + (GRID_SIZE, GRID_SIZE, depth))
+        if removed is not None and len(removed):
+            self._set(indices_to_grid(removed) + base, False)
+        if len(added):
+            self._set(indices_to_grid(added) + base, True)
+        self.frames += 1
+        self._evict()
+
+    def _set(self, voxels, value):
+        if not len(voxels):
+            return
+        size = self.tile_size
+        keys = np.floor_divide(voxels, size)
+        local = voxels - keys * size
+        # Group voxels by tile with one sort over a packed scalar key
+        packed = ((keys[:, 0] + _KEY_OFFSET) << 42) | ((keys[:, 1] + _KEY_OFFSET) << 21) | (keys[:, 2] + _KEY_OFFSET)
+        order = np.argsort(packed, kind="stable")
+        packed = packed[order]
+        starts = np.flatnonzero(np.r_[True, packed[1:] != packed[:-1]])
+        stops = np.r_[starts[1:], len(packed)]
+        for start, stop in zip(starts.tolist(), stops.tolist()):
+            tile = self._tile(tuple(keys[order[start]].tolist()), create=value)
+            if tile is None:
+                continue
+            selected = local[order[start:stop]]
+            tile[selected[:, 0], selected[:, 1], selected[:, 2]] = value
+
+    def _tile(self, key, create=True):
+        tile = self.tiles.get(key)
+        if tile is not None:
+            self.tiles.move_to_end(key)
+        elif create:
+            tile = self.tiles[key] = np.zeros((self.tile_size,) * 3, dtype=bool)
+        return tile
+
+    def _clear_box(self, lower, upper):
+        """Clear global voxels lower <= v < upper in the tiles that exist."""
+        size = self.tile_size
+        first = np.floor_divide(lower, size)
+        last = np.floor_divide(upper - 1, size)
+        for key in self._keys_in_range(first, last):
+            tile = self.tiles[key]
+            start = np.asarray(key) * size
+            lo = np.clip(lower - start, 0, size)
+            hi = np.clip(upper - start, 0, size)
+            tile[lo[0]:hi[0], lo[1]:hi[1], lo[2]:hi[2]] = False
+
+    def _keys_in_range(self, first, last):
+        """Existing tile keys between two tile coordinates, inclusive."""
+        count = np.prod(last - first + 1)
+        if count <= len(self.tiles):
+            ranges = [range(a, b + 1) for a, b in zip(first.tolist(), last.tolist())]
+            return [(x, y, z) for x in ranges[0] for y in ranges[1] for z in ranges[2] if (x, y, z) in self.tiles]
+        return [key for key in self.tiles if all(a <= k <= b for k, a, b in zip(key, first, last))]
+
+    def set_robot_position(self, position):
+        """Robot position in metres (odom frame), used for distance based eviction."""
+        self.robot_position = np.asarray(position, dtype=np.float64)
+        self._evict()
+
+    def _evict(self):
+        if self.max_distance is not None and self.robot_position is not None and self.tiles:
+            keys = list(self.tiles)
+            # Distance of every tile centre to the robot in one call
+            grid = np.fromiter(chain.from_iterable(keys), np.int64, 3 * len(keys)).reshape(-1, 3)
+            centres = (grid + 0.5) * (self.tile_size * self.resolution)
+            far = np.flatnonzero(np.linalg.norm(centres - self.robot_position, axis=1) > self.max_distance)
+            for index in far.tolist():
+                del self.tiles[keys[index]]
+            self.evicted += len(far)
+        while len(self.tiles) > self.max_tiles:
+            self.tiles.popitem(last=False)
+            self.evicted += 1
+
+    def query_voxels(self, lower=None, upper=None):
+        """
+        Occupied global voxel coordinates inside a box.
+
+        :param lower: Minimum corner in metres, None for no bound.
+        :param upper: Maximum corner in metres, None for no bound.
+        :return: (N, 3) int64 voxel coordinates.
+        """
+        size = self.tile_size
+        if lower is None or upper is None:
+            keys = list(self.tiles)
+        else:
+            lo = np.floor(np.asarray(lower) / self.resolution + 0.5).astype(np.int64)
+            hi = np.floor(np.asarray(upper) / self.resolution + 0.5).astype(np.int64)
+            keys = self._keys_in_range(np.floor_divide(lo, size), np.floor_divide(hi, size))
+
+        chunks = []
+        for key in keys:
+            local = np.argwhere(self.tiles[key])
+            if len(local):
+                chunks.append(local + np.asarray(key) * size)
+        voxels = np.concatenate(chunks) if chunks else np.empty((0, 3), dtype=np.int64)
+
+        if lower is not None:
+            voxels = voxels[np.all(voxels * self.resolution >= np.asarray(lower) - 1e-9, axis=1)]
+        if upper is not None:
+            voxels = voxels[np.all(voxels * self.resolution <= np.asarray(upper) + 1e-9, axis=1)]
+        return voxels
+
+    def query(self, lower=None, upper=None):
+        """Occupied voxel centres inside a box, as (N, 3) points in metres."""
+        return self.query_voxels(lower, upper) * self.resolution
+
+    def clear(self):
+        self.tiles.clear()
@@ -15,6 +15,15 @@ class FutureResolver:
         else:
             self.pending_callbacks[key] = [future]
 
+    def discard_resolve(self, message_type, topic, future, identifier):
+        """Forget a pending future, e.g. of a request that timed out."""
+        key = self.generate_message_key(message_type, topic, identifier)
+        futures = self.pending_callbacks.get(key)
+        if futures and future in futures:
+            futures.remove(future)
+            if not futures:
+                del self.pending_callbacks[key]
+
     def run_resolve_for_topic(self, message):
         if not message.get("type"):
             return
@@ -57,7 +66,8 @@ class FutureResolver:
         # Resolve the pending future with the final message
         if key in self.pending_callbacks:
             for future in self.pending_callbacks[key]:
-                if future:
+                # Skip requests that timed out or were cancelled meanwhile
+                if future and not future.done():
                     future.set_result(message)  # Resolve the future with the message
             del self.pending_callbacks[key]
 
@@ -110,7 +120,7 @@ class FutureResolver:
         # Resolve the pending future with the final message
         if key in self.pending_callbacks:
             for future in self.pending_callbacks[key]:
-                if future:
+                if future and not future.done():
                     future.set_result(message)  # Resolve the future with the message
             del self.pending_callbacks[key]
 
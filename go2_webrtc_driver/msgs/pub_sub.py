@@ -13,17 +13,19 @@ class WebRTCDataChannelPubSub:
         self.channel = channel
 
         self.future_resolver = FutureResolver()
-        self.subscriptions = {}  # Dictionary to hold callbacks keyed by topic
+        self.subscriptions = {}  # Dictionary to hold the list of callbacks of each topic
     
     def run_resolve(self, message):
         self.future_resolver.run_resolve_for_topic(message)
 
          # Extract the topic from the message
         topic = message.get("topic")
-        if topic in self.subscriptions:
-            # Call the registered callback with the message
-            callback = self.subscriptions[topic]
-            callback(message)
+        # Call every registered callback; one failing does not stop the others
+        for callback in list(self.subscriptions.get(topic, ())):
+            try:
+                callback(message)
+            except Exception:
+                logging.exception(f"Error in {topic} callback")
         
 
     async def publish(self, topic, data=None, msg_type=None):
@@ -55,6 +57,11 @@ class WebRTCDataChannelPubSub:
             )
 
             self.future_resolver.save_resolve(msg_type or DATA_CHANNEL_TYPE["MSG"], topic, future, uuid)
+            try:
+                return await future
+            finally:
+                # Requests that timed out or were cancelled must not stay pending
+                self.future_resolver.discard_resolve(msg_type or DATA_CHANNEL_TYPE["MSG"], topic, future, uuid)
         else:
             future.set_exception(Exception("Data channel is not open"))
 
@@ -118,6 +125,7 @@ class WebRTCDataChannelPubSub:
         return await self.publish(topic, request_payload, DATA_CHANNEL_TYPE["REQUEST"])
     
     def subscribe(self, topic, callback=None):
+        """Subscribe to a topic; every callback registered for it is called with each message."""
         channel = self.channel
 
         if not channel or channel.readyState != "open":
@@ -126,11 +134,26 @@ class WebRTCDataChannelPubSub:
         
         # Register the callback for the topic
         if callback:
-            self.subscriptions[topic] = callback
+            callbacks = self.subscriptions.setdefault(topic, [])
+            if callback not in callbacks:
+                callbacks.append(callback)
 
         self.publish_without_callback(topic=topic, msg_type=DATA_CHANNEL_TYPE["SUBSCRIBE"])
 
-    def unsubscribe(self, topic):
+    def unsubscribe(self, topic, callback=None):
+        """
+        Remove one callback of a topic, or all of them.
+
+        The topic is only unsubscribed on the robot once no callback is left.
+        """
+        if callback is not None:
+            callbacks = self.subscriptions.get(topic, [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+            if callbacks:
+                return
+        self.subscriptions.pop(topic, None)
+
         channel = self.channel
 
         if not channel or channel.readyState != "open":
@@ -1,7 +1,10 @@
+import asyncio
 import socket
 import struct
 import json
 import logging
+import time
+import weakref
 
 RECV_PORT = 10134  # Port where the devices will send the multicast responses
 MULTICAST_GROUP = '231.1.1.1'  # Multicast group IP address
@@ -13,17 +16,7 @@ def discover_ip_sn(timeout=2):
     # Use a dictionary to store the serial number to IP mapping
     serial_to_ip = {}
 
-    # Create a UDP socket
-    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
-    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-
-    # Bind the socket to the port
-    sock.bind(('', RECV_PORT))
-
-    # Tell the operating system to add the socket to the multicast group
-    # on all interfaces.
-    mreq = struct.pack("4sl", socket.inet_aton(MULTICAST_GROUP), socket.INADDR_ANY)
-    sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+    sock = _create_multicast_socket()
 
     # Send a multicast query to discover devices
     query_message = json.dumps({"name": "unitree_dapengche"})
@@ -62,6 +55,207 @@ def discover_ip_sn(timeout=2):
 
     return serial_to_ip
 
+def _create_multicast_socket():
+    """Create a non-blocking UDP socket bound to RECV_PORT and joined to the multicast group."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(('', RECV_PORT))
+    mreq = struct.pack("4sl", socket.inet_aton(MULTICAST_GROUP), socket.INADDR_ANY)
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+    sock.setblocking(False)
+    return sock
+
+
+class _DiscoveryProtocol(asyncio.DatagramProtocol):
+    def __init__(self, on_device):
+        self.on_device = on_device
+
+    def datagram_received(self, data, addr):
+        try:
+            message_dict = json.loads(data.decode('utf-8'))
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            logging.error(f"Error decoding JSON message: {e}")
+            return
+        if isinstance(message_dict, dict) and "sn" in message_dict:
+            self.on_device(message_dict["sn"], message_dict.get("ip", addr[0]))
+
+    def error_received(self, exc):
+        logging.error(f"Multicast discovery socket error: {exc}")
+
+
+class MulticastDiscovery:
+    """
+    Asynchronous multicast discovery of Go2 devices.
+
+    A single UDP endpoint on the event loop serves any number of concurrent
+    lookups. Every response is stored in a serial number -> IP cache whose
+    entries expire after `ttl` seconds, and lookups return as soon as the
+    requested serial number answers instead of waiting for the full timeout.
+    """
+
+    def __init__(self, ttl=30.0):
+        self.ttl = ttl
+        self._cache = {}  # serial number -> (ip, monotonic time last seen)
+        self._waiters = {}  # serial number -> list of futures
+        self._transport = None
+        self._scan_task = None
+
+    async def start(self):
+        """Open the discovery socket on the running loop. Safe to call repeatedly."""
+        if self._transport is None:
+            loop = asyncio.get_running_loop()
+            self._transport, _ = await loop.create_datagram_endpoint(
+                lambda: _DiscoveryProtocol(self._on_device),
+                sock=_create_multicast_socket(),
+            )
+
+    def close(self):
+        """Stop background scanning, close the socket and fail pending lookups."""
+        self.stop_background_scan()
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+        for futures in self._waiters.values():
+            for future in futures:
+                if not future.done():
+                    future.cancel()
+        self._waiters.clear()
+
+    def send_query(self):
+        """Send a multicast query. Responses are handled asynchronously."""
+        if self._transport is None:
+            raise RuntimeError("Discovery is not started")
+        query_message = json.dumps({"name": "unitree_dapengche"})
+        try:
+            self._transport.sendto(query_message.encode('utf-8'), (MULTICAST_GROUP, MULTICAST_PORT))
+        except Exception as e:
+            logging.error(f"Error sending multicast query: {e}")
+
+    def _on_device(self, serial_number, ip_address):
+        if self._cache.get(serial_number, (None,))[0] != ip_address:
+            print(f"Discovered device: {serial_number} at {ip_address}")
+        self._cache[serial_number] = (ip_address, time.monotonic())
+
+        for future in self._waiters.pop(serial_number, []):
+            if not future.done():
+                future.set_result(ip_address)
+
+    def get_cached(self, serial_number):
+        """Return the cached IP of a serial number, or None if unknown or expired."""
+        entry = self._cache.get(serial_number)
+        if entry and time.monotonic() - entry[1] <= self.ttl:
+            return entry[0]
+        return None
+
+    def devices(self):
+        """Return the serial number -> IP mapping of all devices seen within the TTL."""
+        now = time.monotonic()
+        return {sn: ip for sn, (ip, seen) in self._cache.items() if now - seen <= self.ttl}
+
+    async def discover(self, serial_number, timeout=2, query_interval=0.5):
+        """
+        Resolve the IP of a serial number.
+
+        :param serial_number: Serial number of the Go2 to look for.
+        :param timeout: Maximum seconds to wait for an answer.
+        :param query_interval: Seconds between repeated multicast queries.
+        :return: IP address, or None if the device did not answer in time.
+        """
+        ip_address = self.get_cached(serial_number)
+        if ip_address:
+            return ip_address
+
+        await self.start()
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(serial_number, []).append(future)
+
+        deadline = time.monotonic() + timeout
+        try:
+            while True:
+                self.send_query()
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                try:
+                    return await asyncio.wait_for(asyncio.shield(future), min(query_interval, remaining))
+                except asyncio.TimeoutError:
+                    continue
+        finally:
+            waiters = self._waiters.get(serial_number)
+            if waiters and future in waiters:
+                waiters.remove(future)
+                if not waiters:
+                    del self._waiters[serial_number]
+            future.cancel()
+
+    async def scan(self, timeout=2):
+        """Query the network and return every device that answered within `timeout` seconds."""
+        await self.start()
+        self.send_query()
+        await asyncio.sleep(timeout)
+        return self.devices()
+
+    def start_background_scan(self, interval=10):
+        """Keep the cache warm by querying the network every `interval` seconds."""
+        if self._scan_task is None or self._scan_task.done():
+            self._scan_task = asyncio.ensure_future(self._background_scan(interval))
+
+    def stop_background_scan(self):
+        if self._scan_task is not None:
+            self._scan_task.cancel()
+            self._scan_task = None
+
+    async def _background_scan(self, interval):
+        await self.start()
+        while True:
+            self.send_query()
+            await asyncio.sleep(interval)
+
+
+# One shared discovery instance per event loop, with the number of users holding it
+_shared_discoveries = weakref.WeakKeyDictionary()
+
+
+def get_shared_discovery():
+    """
+    Return the MulticastDiscovery shared by all connections on the running loop.
+
+    Connections hold it with acquire_shared_discovery() and the last one to
+    release it closes its socket. Hold it the same way to keep it open (e.g.
+    for a background scan), or close it with close_shared_discovery().
+    """
+    loop = asyncio.get_running_loop()
+    entry = _shared_discoveries.get(loop)
+    if entry is None:
+        entry = _shared_discoveries[loop] = [MulticastDiscovery(), 0]
+    return entry[0]
+
+
+def acquire_shared_discovery():
+    """Return the shared discovery of the running loop and count one more user of it."""
+    discovery = get_shared_discovery()
+    _shared_discoveries[asyncio.get_running_loop()][1] += 1
+    return discovery
+
+
+def release_shared_discovery(discovery):
+    """Drop a user of the shared discovery; the last one closes it."""
+    loop = asyncio.get_running_loop()
+    entry = _shared_discoveries.get(loop)
+    if entry is None or entry[0] is not discovery:
+        return
+    entry[1] -= 1
+    if entry[1] <= 0:
+        close_shared_discovery()
+
+
+def close_shared_discovery():
+    """Close the shared discovery of the running loop; the next get_shared_discovery() opens a new one."""
+    entry = _shared_discoveries.pop(asyncio.get_running_loop(), None)
+    if entry is not None:
+        entry[0].close()
+
+
 if __name__ == '__main__':
     print("Discovering devices on the network...")
     serial_to_ip = discover_ip_sn(timeout=3)
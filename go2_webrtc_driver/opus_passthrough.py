@@ -0,0 +1,243 @@
+import asyncio
+import fractions
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+import av
+import numpy as np
+from aiortc.mediastreams import MediaStreamError, MediaStreamTrack
+
+# Opus RTP always uses a 48 kHz clock
+OPUS_SAMPLE_RATE = 48000
+OPUS_TIME_BASE = fractions.Fraction(1, OPUS_SAMPLE_RATE)
+# 20 ms, the frame size aiortc's own encoder uses
+OPUS_FRAME_SAMPLES = 960
+
+
+class OpusClip:
+    """Pre-encoded Opus packets of one clip, with the duration of each packet in 48 kHz samples."""
+
+    def __init__(self, packets, durations):
+        self.packets = packets
+        self.durations = durations
+
+    @property
+    def duration(self):
+        """Length of the clip in seconds."""
+        return sum(self.durations) / OPUS_SAMPLE_RATE
+
+    def __len__(self):
+        return len(self.packets)
+
+
+def _encoder(bitrate):
+    codec = av.CodecContext.create("libopus", "w")
+    codec.sample_rate = OPUS_SAMPLE_RATE
+    codec.layout = "stereo"
+    codec.format = "s16"
+    codec.bit_rate = bitrate
+    return codec
+
+
+def encode_opus(frames, bitrate=64000):
+    """
+    Encode av.AudioFrames of any format to an OpusClip of 20 ms stereo packets.
+
+    :param frames: Iterable of av.AudioFrame.
+    :param bitrate: Encoder bitrate in bit/s.
+    """
+    codec = _encoder(bitrate)
+    resampler = av.AudioResampler(
+        format="s16", layout="stereo", rate=OPUS_SAMPLE_RATE, frame_size=OPUS_FRAME_SAMPLES
+    )
+    packets = []
+    durations = []
+    samples = 0
+
+    def collect(frame):
+        for packet in codec.encode(frame):
+            packets.append(bytes(packet))
+            durations.append(OPUS_FRAME_SAMPLES)
+
+    for frame in frames:
+        for resampled in resampler.resample(frame):
+            resampled.pts = samples
+            resampled.time_base = OPUS_TIME_BASE
+            samples += resampled.samples
+            collect(resampled)
+    for resampled in resampler.resample(None):
+        # Pad the last partial frame with silence, the encoder needs whole frames
+        if resampled.samples < OPUS_FRAME_SAMPLES:
+            data = np.zeros((1, OPUS_FRAME_SAMPLES * 2), dtype=np.int16)
+            data[:, :resampled.samples * 2] = resampled.to_ndarray()
+            resampled = av.AudioFrame.from_ndarray(data, format="s16", layout="stereo")
+            resampled.sample_rate = OPUS_SAMPLE_RATE
+        resampled.pts = samples
+        resampled.time_base = OPUS_TIME_BASE
+        samples += resampled.samples
+        collect(resampled)
+    collect(None)
+    return OpusClip(packets, durations)
+
+
+def load_opus_clip(path, bitrate=64000):
+    """
+    Load an audio file as an OpusClip.
+
+    Opus files (Ogg, WebM) are demuxed without decoding; anything else is
+    decoded and encoded once.
+    """
+    with av.open(path) as container:
+        stream = container.streams.audio[0]
+        if stream.codec_context.name != "opus":
+            return encode_opus(container.decode(stream), bitrate)
+
+        packets = []
+        durations = []
+        for packet in container.demux(stream):
+            if not packet.size:
+                continue
+            packets.append(bytes(packet))
+            if packet.duration:
+                durations.append(int(packet.duration * packet.time_base * OPUS_SAMPLE_RATE))
+            else:
+                durations.append(OPUS_FRAME_SAMPLES)
+        return OpusClip(packets, durations)
+
+
+_silence = None
+
+
+def silence_packet():
+    """A 20 ms Opus packet of silence, encoded once."""
+    global _silence
+    if _silence is None:
+        frame = av.AudioFrame.from_ndarray(
+            np.zeros((1, OPUS_FRAME_SAMPLES * 2), dtype=np.int16), format="s16", layout="stereo"
+        )
+        frame.sample_rate = OPUS_SAMPLE_RATE
+        _silence = encode_opus([frame]).packets[0]
+    return _silence
+
+
+class OpusClipCache:
+    """
+    Pre-encoded clips by file, so announcements played over and over are
+    encoded at most once per process.
+
+    Entries are keyed by path and modification time, so an edited file is
+    encoded again; the least recently used clips are dropped beyond `max_clips`.
+    """
+
+    def __init__(self, max_clips=32, bitrate=64000):
+        self.max_clips = max_clips
+        self.bitrate = bitrate
+        self.hits = 0
+        self.misses = 0
+        self._clips = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        """OpusClip of the file at `path`, loading it on a miss."""
+        path = os.path.abspath(path)
+        key = (path, os.path.getmtime(path))
+        with self._lock:
+            clip = self._clips.get(key)
+            if clip is not None:
+                self._clips.move_to_end(key)
+                self.hits += 1
+                return clip
+        clip = load_opus_clip(path, self.bitrate)
+        with self._lock:
+            self.misses += 1
+            self._clips[key] = clip
+            while len(self._clips) > self.max_clips:
+                self._clips.popitem(last=False)
+        return clip
+
+    def clear(self):
+        with self._lock:
+            self._clips.clear()
+
+
+class OpusPassthroughTrack(MediaStreamTrack):
+    """
+    Outbound audio track that sends pre-encoded Opus packets as they are.
+
+    recv() returns av.Packets rather than frames, which aiortc's RTCRtpSender
+    packetizes directly, skipping the decode and re-encode it does for
+    MediaPlayer and PCM tracks. Packets are paced by their duration; when
+    nothing is queued a cached 20 ms silent packet is sent so the stream and
+    its timestamps stay continuous.
+    """
+
+    kind = "audio"
+
+    def __init__(self, cache=None):
+        """
+        :param cache: OpusClipCache used by play() for file paths, a private one by default.
+        """
+        super().__init__()
+        self.cache = cache or OpusClipCache()
+        self.packets_sent = 0
+        self._queue = deque()
+        self._start = None
+        self._timestamp = 0
+
+    async def play(self, clip):
+        """
+        Queue a clip behind whatever is already playing.
+
+        Files are loaded through the cache in the default executor, so a file
+        that has to be decoded and encoded does not block the event loop.
+
+        :param clip: OpusClip, or the path of an audio file.
+        :return: The queued OpusClip.
+        """
+        if not isinstance(clip, OpusClip):
+            clip = await asyncio.get_running_loop().run_in_executor(None, self.cache.get, clip)
+        self._queue.extend(zip(clip.packets, clip.durations))
+        return clip
+
+    def push_packet(self, data, duration=OPUS_FRAME_SAMPLES):
+        """
+        Queue one Opus packet, e.g. from a network stream.
+
+        :param data: The encoded packet.
+        :param duration: Its length in 48 kHz samples.
+        """
+        self._queue.append((bytes(data), duration))
+
+    def clear(self):
+        """Stop the current clip and drop everything queued."""
+        self._queue.clear()
+
+    @property
+    def queued(self):
+        """Seconds of audio waiting to be sent."""
+        return sum(duration for _, duration in list(self._queue)) / OPUS_SAMPLE_RATE
+
+    async def recv(self):
+        if self.readyState != "live":
+            raise MediaStreamError
+
+        if self._start is None:
+            self._start = time.time()
+        else:
+            wait = self._start + self._timestamp / OPUS_SAMPLE_RATE - time.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+        try:
+            data, duration = self._queue.popleft()
+        except IndexError:
+            data, duration = silence_packet(), OPUS_FRAME_SAMPLES
+
+        packet = av.Packet(data)
+        packet.pts = self._timestamp
+        packet.time_base = OPUS_TIME_BASE
+        self._timestamp += duration
+        self.packets_sent += 1
+        return packet
@@ -0,0 +1,155 @@
+import asyncio
+import fractions
+import threading
+import time
+
+import av
+import numpy as np
+from aiortc.mediastreams import MediaStreamError, MediaStreamTrack
+
+# aiortc sends 20 ms audio frames
+AUDIO_PTIME = 0.02
+
+
+class PushAudioTrack(MediaStreamTrack):
+    """
+    Outbound audio track fed with PCM buffers pushed by the application.
+
+    push() accepts NumPy arrays or bytes from any thread (TTS output, a live
+    microphone) and appends them to a small FIFO; recv() hands aiortc a 20 ms
+    frame every 20 ms, playing silence when nothing is queued. Audio is only
+    resampled when it does not already match the track's rate and layout.
+
+    The added latency is `latency` (buffered before playback starts, to ride
+    out bursty producers) plus at most one frame. `underruns` counts the
+    times the FIFO ran dry while playing, which includes the end of every
+    pushed burst; `overruns` counts pushes that overflowed `max_buffer`.
+    """
+
+    kind = "audio"
+
+    def __init__(self, sample_rate=48000, channels=2, latency=0.04, max_buffer=2.0):
+        """
+        :param sample_rate: Rate of the frames sent to the encoder (48000 avoids resampling in aiortc).
+        :param channels: 1 or 2.
+        :param latency: Seconds buffered before playback of a new burst starts.
+        :param max_buffer: Seconds of audio kept; pushing more drops the oldest audio.
+        """
+        super().__init__()
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.layout = "mono" if channels == 1 else "stereo"
+        self.samples_per_frame = int(AUDIO_PTIME * sample_rate)
+        self.prefetch = int(latency * sample_rate)
+        self.capacity = max(int(max_buffer * sample_rate), self.prefetch + self.samples_per_frame)
+        self.underruns = 0
+        self.overruns = 0
+        self._fifo = np.zeros((self.capacity, channels), dtype=np.int16)
+        self._read = 0
+        self._count = 0
+        self._playing = False
+        self._lock = threading.Lock()
+        self._resamplers = {}
+        self._start = None
+        self._timestamp = 0
+
+    @property
+    def buffered(self):
+        """Seconds of audio waiting to be sent."""
+        return self._count / self.sample_rate
+
+    def push(self, samples, sample_rate=None, channels=None):
+        """
+        Queue audio for sending.
+
+        :param samples: int16 or float32 (-1..1) NumPy array of shape (n,) or
+            (n, channels), or interleaved s16 bytes.
+        :param sample_rate: Rate of the pushed audio, defaults to the track's.
+        :param channels: Channel count of bytes input, defaults to the track's.
+        """
+        sample_rate = sample_rate or self.sample_rate
+        if isinstance(samples, (bytes, bytearray, memoryview)):
+            samples = np.frombuffer(samples, dtype=np.int16).reshape(-1, channels or self.channels)
+        samples = np.asarray(samples)
+        if samples.ndim == 1:
+            samples = samples[:, None]
+        if samples.dtype != np.int16:
+            samples = (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16)
+
+        if sample_rate != self.sample_rate or samples.shape[1] != self.channels:
+            samples = self._resample(samples, sample_rate)
+        self._write(samples)
+
+    def _resample(self, samples, sample_rate):
+        channels = samples.shape[1]
+        key = (sample_rate, channels)
+        resampler = self._resamplers.get(key)
+        if resampler is None:
+            # One resampler per input format keeps its filter state across pushes
+            resampler = av.AudioResampler(format="s16", layout=self.layout, rate=self.sample_rate)
+            self._resamplers[key] = resampler
+        frame = av.AudioFrame.from_ndarray(
+            np.ascontiguousarray(samples).reshape(1, -1), format="s16", layout="mono" if channels == 1 else "stereo"
+        )
+        frame.sample_rate = sample_rate
+        out = [f.to_ndarray().reshape(-1, self.channels) for f in resampler.resample(frame)]
+        return np.concatenate(out) if out else np.zeros((0, self.channels), dtype=np.int16)
+
+    def _write(self, samples):
+        with self._lock:
+            samples = samples[-self.capacity:]
+            excess = self._count + len(samples) - self.capacity
+            if excess > 0:
+                # Drop the oldest audio rather than growing the latency
+                self._read = (self._read + excess) % self.capacity
+                self._count -= excess
+                self.overruns += 1
+            position = (self._read + self._count) % self.capacity
+            first = min(len(samples), self.capacity - position)
+            self._fifo[position:position + first] = samples[:first]
+            self._fifo[:len(samples) - first] = samples[first:]
+            self._count += len(samples)
+
+    def clear(self):
+        """Drop everything queued, e.g. to interrupt speech."""
+        with self._lock:
+            self._count = 0
+            self._playing = False
+
+    def _read_frame(self, out):
+        with self._lock:
+            if not self._playing:
+                if self._count < max(self.prefetch, 1):
+                    return False
+                self._playing = True
+            available = min(self._count, len(out))
+            first = min(available, self.capacity - self._read)
+            out[:first] = self._fifo[self._read:self._read + first]
+            out[first:available] = self._fifo[:available - first]
+            self._read = (self._read + available) % self.capacity
+            self._count -= available
+            if available < len(out):
+                # Ran dry mid-frame: pad with silence and buffer again before resuming
+                self.underruns += 1
+                self._playing = False
+            return available > 0
+
+    async def recv(self):
+        if self.readyState != "live":
+            raise MediaStreamError
+
+        if self._start is None:
+            self._start = time.time()
+        else:
+            self._timestamp += self.samples_per_frame
+            wait = self._start + self._timestamp / self.sample_rate - time.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+        samples = np.zeros((self.samples_per_frame, self.channels), dtype=np.int16)
+        self._read_frame(samples)
+        frame = av.AudioFrame.from_ndarray(samples.reshape(1, -1), format="s16", layout=self.layout)
+        frame.sample_rate = self.sample_rate
+        frame.pts = self._timestamp
+        frame.time_base = fractions.Fraction(1, self.sample_rate)
+        return frame
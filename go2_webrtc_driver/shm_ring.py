@@ -0,0 +1,159 @@
+import struct
+import sys
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+# Header: write sequence (uint64), slot count (uint32), slot payload size (uint32)
+_HEADER = struct.Struct("<QII")
+# Slot header: slot sequence (uint64), payload length (uint32)
+_SLOT_HEADER = struct.Struct("<QI")
+_HEADER_SIZE = 64
+_SLOT_HEADER_SIZE = 16
+
+_attach_lock = threading.Lock()
+
+
+def attach_shared_memory(name):
+    """
+    Attach to an existing shared memory block without taking ownership of it.
+
+    Before Python 3.13 attaching registers the block with the resource
+    tracker, which unlinks it when the reader exits and pulls it from under
+    the writer. Only the creating process should unlink it, so registration
+    is skipped while attaching.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    with _attach_lock:
+        register = resource_tracker.register
+        resource_tracker.register = lambda *args, **kwargs: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+class SharedMemoryRing:
+    """
+    Single-producer, multi-consumer ring of variable sized messages in shared memory.
+
+    Every slot is protected by a sequence lock: the writer marks the slot odd
+    while copying and even once the payload is complete, so readers in other
+    processes never need a lock and simply retry (or skip) a slot that was
+    overwritten while they were reading it. Readers that fall more than
+    `slots` messages behind lose the oldest messages.
+
+    The ring takes slots * slot_size bytes of /dev/shm (16 MB by default),
+    which Docker limits to 64 MB unless started with --shm-size.
+    """
+
+    def __init__(self, name=None, slots=16, slot_size=1 << 20, create=True):
+        if create:
+            size = _HEADER_SIZE + slots * (_SLOT_HEADER_SIZE + slot_size)
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            _HEADER.pack_into(self.shm.buf, 0, 0, slots, slot_size)
+        else:
+            self.shm = attach_shared_memory(name)
+            _, slots, slot_size = _HEADER.unpack_from(self.shm.buf, 0)
+        self.name = self.shm.name
+        self.slots = slots
+        self.slot_size = slot_size
+        self._stride = _SLOT_HEADER_SIZE + slot_size
+
+    @classmethod
+    def attach(cls, name):
+        """Attach to a ring created by another process."""
+        return cls(name=name, create=False)
+
+    @property
+    def write_seq(self):
+        """Number of messages written so far."""
+        return _HEADER.unpack_from(self.shm.buf, 0)[0]
+
+    def _slot_offset(self, seq):
+        return _HEADER_SIZE + (seq % self.slots) * self._stride
+
+    def write(self, payload):
+        """
+        Append a message. Only one process may write to a ring.
+
+        :raises ValueError: If the payload does not fit in a slot.
+        """
+        length = len(payload)
+        if length > self.slot_size:
+            raise ValueError(f"Payload of {length} bytes exceeds slot size {self.slot_size}")
+
+        buf = self.shm.buf
+        seq = self.write_seq
+        offset = self._slot_offset(seq)
+
+        # Odd slot sequence: write in progress
+        _SLOT_HEADER.pack_into(buf, offset, 2 * seq + 1, length)
+        start = offset + _SLOT_HEADER_SIZE
+        buf[start:start + length] = payload
+        _SLOT_HEADER.pack_into(buf, offset, 2 * seq + 2, length)
+
+        struct.pack_into("<Q", buf, 0, seq + 1)
+        return seq
+
+    def read(self, seq, retries=3):
+        """
+        Read message number `seq`.
+
+        :return: The payload as bytes, or None if it was overwritten or not written yet.
+        """
+        buf = self.shm.buf
+        offset = self._slot_offset(seq)
+        expected = 2 * seq + 2
+        for _ in range(retries):
+            before, length = _SLOT_HEADER.unpack_from(buf, offset)
+            if before > expected:
+                return None
+            if before != expected:
+                # Not written yet, or being written right now
+                time.sleep(0)
+                continue
+            start = offset + _SLOT_HEADER_SIZE
+            payload = bytes(buf[start:start + length])
+            after, _ = _SLOT_HEADER.unpack_from(buf, offset)
+            if after == before:
+                return payload
+        return None
+
+    def read_latest(self):
+        """
+        Return (seq, payload) of the most recent complete message, or None.
+        """
+        seq = self.write_seq
+        while seq > 0:
+            seq -= 1
+            payload = self.read(seq)
+            if payload is not None:
+                return seq, payload
+            if self.write_seq - seq >= self.slots:
+                break
+        return None
+
+    def read_since(self, cursor):
+        """
+        Return all messages written from `cursor` on, plus the new cursor.
+
+        :return: ([(seq, payload), ...], next_cursor)
+        """
+        end = self.write_seq
+        # Skip what has already been overwritten
+        start = max(cursor, end - self.slots + 1)
+        messages = []
+        for seq in range(start, end):
+            payload = self.read(seq)
+            if payload is not None:
+                messages.append((seq, payload))
+        return messages, end
+
+    def close(self):
+        self.shm.close()
+
+    def unlink(self):
+        """Free the shared memory. Call once, from the process that created the ring."""
+        self.shm.unlink()
@@ -5,9 +5,10 @@ import urllib.parse
 import base64
 import logging
 import json
-import sys
-from Crypto.PublicKey import RSA
-from .encryption import aes_encrypt, generate_aes_key, rsa_encrypt, aes_decrypt, rsa_load_public_key
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from Crypto.PublicKey import RSA
 
 def _calc_local_path_ending(data1):
     # Initialize an array of strings
@@ -113,7 +114,9 @@ def make_local_request(path, body=None, headers=None):
         return None
 
 # Function to send SDP to peer and receive the answer
-def send_sdp_to_remote_peer(serial: str, sdp: str, access_token: str, public_key: RSA.RsaKey) -> str:
+def send_sdp_to_remote_peer(serial: str, sdp: str, access_token: str, public_key: "RSA.RsaKey") -> str:
+    from .encryption import aes_encrypt, generate_aes_key, rsa_encrypt, aes_decrypt
+
     logging.info("Sending SDP to Go2...")
     aes_key = generate_aes_key()
     path = "webrtc/connect"
@@ -128,8 +131,7 @@ def send_sdp_to_remote_peer(serial: str, sdp: str, access_token: str, public_key
         logging.info("Received SDP Answer from Go2!")
         return aes_decrypt(response['data'], aes_key)
     elif response.get("code") == 1000:
-        print("Device not online")
-        sys.exit(1)
+        raise ValueError("Device not online")
     else:
         raise ValueError(f"Failed to receive SDP Answer: {response}")
     
@@ -197,6 +199,8 @@ def send_sdp_to_local_peer_old_method(ip, sdp):
         return None
 
 def send_sdp_to_local_peer_new_method(ip, sdp):
+    from .encryption import aes_encrypt, generate_aes_key, rsa_encrypt, aes_decrypt, rsa_load_public_key
+
     try:
         url = f"http://{ip}:9991/con_notify"
 
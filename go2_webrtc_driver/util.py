@@ -5,9 +5,11 @@ import random
 import requests
 import time
 import sys
-from Crypto.PublicKey import RSA
+from typing import TYPE_CHECKING
 from .unitree_auth import make_remote_request
-from .encryption import rsa_encrypt, rsa_load_public_key, aes_decrypt, generate_aes_key
+
+if TYPE_CHECKING:
+    from Crypto.PublicKey import RSA
 
 # Function to generate MD5 hash of a string
 
@@ -55,7 +57,9 @@ def fetch_token(email: str, password: str) -> str:
 
 
 # Function to obtain a public key
-def fetch_public_key() -> RSA.RsaKey:
+def fetch_public_key() -> "RSA.RsaKey":
+    from .encryption import rsa_load_public_key
+
     logging.info("Obtaining a Public key...")
     path = "system/pubKey"
     
@@ -82,7 +86,9 @@ def fetch_public_key() -> RSA.RsaKey:
 
 
 # Function to obtain TURN server info
-def fetch_turn_server_info(serial: str, access_token: str, public_key: RSA.RsaKey) -> dict:
+def fetch_turn_server_info(serial: str, access_token: str, public_key: "RSA.RsaKey") -> dict:
+    from .encryption import rsa_encrypt, aes_decrypt, generate_aes_key
+
     logging.info("Obtaining TURN server info...")
     aes_key = generate_aes_key()
     path = "webrtc/account"
@@ -0,0 +1,173 @@
+import fractions
+import logging
+import queue
+import threading
+import time
+from collections import deque
+
+import av
+
+from .connection_profiler import window_stats
+
+VIDEO_TIME_BASE = fractions.Fraction(1, 90000)
+
+
+class EncodedFrameTap:
+    """
+    Stands in for an RTCRtpReceiver's decoder queue to get at encoded frames.
+
+    aiortc's receiver puts (codec, encoded_frame) tuples, and None on stop,
+    into a queue drained by its own decoder thread. The tap hands every
+    reassembled H.264 frame (Annex B, RTP timestamp) to its listeners, then
+    to the ThreadedVideoDecoder if one is set, or else to aiortc's decoder.
+    Listeners run on the event loop and must return quickly.
+    """
+
+    def __init__(self, original):
+        self.original = original
+        self.decoder = None
+        self.listeners = []
+
+    @classmethod
+    def install(cls, receiver):
+        """Return the tap of a receiver, installing it on first use."""
+        # Private queue aiortc's receiver feeds its decoder thread from
+        attribute = "_RTCRtpReceiver__decoder_queue"
+        current = getattr(receiver, attribute)
+        if isinstance(current, cls):
+            return current
+        tap = cls(current)
+        setattr(receiver, attribute, tap)
+        return tap
+
+    def put(self, item, *args, **kwargs):
+        if item is None:
+            # Stop our thread first so the frame it is decoding reaches the track before aiortc's end marker
+            if self.decoder is not None:
+                self.decoder.stop()
+            self.original.put(None)
+            return
+
+        codec, encoded_frame = item
+        if codec.name == "H264":
+            for listener in self.listeners:
+                try:
+                    listener(encoded_frame.data, encoded_frame.timestamp)
+                except Exception as e:
+                    logging.error(f"Error in encoded frame listener {listener}: {e}")
+            if self.decoder is not None:
+                self.decoder.put(encoded_frame)
+                return
+        self.original.put(item, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.original, name)
+
+
+class ThreadedVideoDecoder:
+    """
+    Decodes the robot's H.264 stream in a dedicated thread with PyAV threading.
+
+    aiortc already decodes off the event loop, but with a single threaded
+    codec context, so a 1280x720 keyframe can take longer than a frame
+    interval on small CPUs. This decoder takes the reassembled frames from
+    the RTP receiver, decodes them with libavcodec's frame/slice threads and
+    hands the decoded frames to the remote track on the event loop, while
+    keeping per-frame decode times. Frames are fed by an EncodedFrameTap.
+    """
+
+    def __init__(self, thread_type="AUTO", thread_count=0, window=300):
+        """
+        :param thread_type: libavcodec threading mode ("AUTO", "FRAME", "SLICE" or "NONE").
+            Frame threading adds up to thread_count frames of latency; use "SLICE"
+            when latency matters more than throughput.
+        :param thread_count: Decoder threads, 0 lets libavcodec pick one per core.
+        :param window: Number of recent frames kept for the decode time statistics.
+        """
+        self.thread_type = thread_type
+        self.thread_count = thread_count
+        self.decode_times = deque(maxlen=window)
+        self.frames_decoded = 0
+        self.errors = 0
+        self._input = queue.Queue()
+        self._thread = None
+        self._loop = None
+        self._output = None
+
+    def start(self, output, loop):
+        """
+        Start decoding into a track's frame queue.
+
+        :param output: asyncio.Queue of the RemoteStreamTrack frames are delivered to.
+        :param loop: Event loop owning that queue.
+        """
+        self._output = output
+        self._loop = loop
+        self._thread = threading.Thread(target=self._run, name="video-decoder", daemon=True)
+        self._thread.start()
+
+    def put(self, encoded_frame):
+        self._input.put(encoded_frame)
+
+    def stop(self, timeout=1.0):
+        """
+        Stop the decoder thread.
+
+        Encoded frames still queued are dropped, so this only waits for the
+        frame being decoded, at most `timeout` seconds, and is safe to call
+        from the event loop.
+        """
+        if self._thread is not None:
+            while True:
+                try:
+                    self._input.get_nowait()
+                except queue.Empty:
+                    break
+            self._input.put(None)
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                logging.warning("Video decoder thread did not stop in time")
+            self._thread = None
+
+    def _create_codec(self):
+        codec = av.CodecContext.create("h264", "r")
+        codec.thread_type = self.thread_type
+        codec.thread_count = self.thread_count
+        return codec
+
+    def _run(self):
+        codec = self._create_codec()
+        while True:
+            encoded_frame = self._input.get()
+            if encoded_frame is None:
+                break
+            packet = av.Packet(encoded_frame.data)
+            packet.pts = encoded_frame.timestamp
+            packet.time_base = VIDEO_TIME_BASE
+            started = time.perf_counter()
+            try:
+                frames = codec.decode(packet)
+            except av.AVError as e:
+                self.errors += 1
+                logging.warning(f"Failed to decode video frame, skipping it: {e}")
+                continue
+            self.decode_times.append(time.perf_counter() - started)
+            for frame in frames:
+                self.frames_decoded += 1
+                try:
+                    self._loop.call_soon_threadsafe(self._output.put_nowait, frame)
+                except RuntimeError:
+                    # The event loop is closed, nobody is left to receive frames
+                    return
+
+    def stats(self, percentiles=(50, 90, 99)):
+        """
+        Decoder statistics: frames, errors, backlog (encoded frames waiting)
+        and decode_time percentiles in seconds.
+        """
+        return {
+            "frames": self.frames_decoded,
+            "errors": self.errors,
+            "backlog": self._input.qsize(),
+            "decode_time": window_stats(list(self.decode_times), percentiles),
+        }
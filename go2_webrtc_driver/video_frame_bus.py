@@ -0,0 +1,192 @@
+import time
+import numpy as np
+from multiprocessing import shared_memory
+
+from .shm_ring import attach_shared_memory
+
+# Header: frames written, slot count, frame geometry
+_HEADER_DTYPE = np.dtype([
+    ("seq", "<u8"),
+    ("slots", "<u4"),
+    ("width", "<u4"),
+    ("height", "<u4"),
+    ("channels", "<u4"),
+    ("format", "S16"),
+])
+_HEADER_SIZE = 64
+
+# Per slot header. slot_seq is odd while the slot is being written
+_SLOT_HEADER_DTYPE = np.dtype([
+    ("slot_seq", "<u8"),
+    ("frame_index", "<u8"),
+    ("pts", "<i8"),
+    ("time_base", "<f8"),
+    ("recv_time", "<f8"),
+])
+_SLOT_HEADER_SIZE = 64
+
+# Channels per pixel of the packed formats the bus can carry
+FORMAT_CHANNELS = {"bgr24": 3, "rgb24": 3, "gray": 1}
+
+
+class _VideoFrameBusMemory:
+    def __init__(self, shm):
+        self.shm = shm
+        self.name = shm.name
+        self.header = np.ndarray((), dtype=_HEADER_DTYPE, buffer=shm.buf, offset=0)
+        self.slots = int(self.header["slots"])
+        self.width = int(self.header["width"])
+        self.height = int(self.header["height"])
+        self.channels = int(self.header["channels"])
+        self.format = self.header["format"][()].decode()
+
+        frame_size = self.width * self.height * self.channels
+        stride = _SLOT_HEADER_SIZE + frame_size
+        shape = (self.height, self.width, self.channels) if self.channels > 1 else (self.height, self.width)
+        self.slot_headers = []
+        self.slot_images = []
+        for i in range(self.slots):
+            offset = _HEADER_SIZE + i * stride
+            self.slot_headers.append(np.ndarray((), dtype=_SLOT_HEADER_DTYPE, buffer=shm.buf, offset=offset))
+            self.slot_images.append(np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=offset + _SLOT_HEADER_SIZE))
+
+    def close(self):
+        # Drop the numpy views first, SharedMemory.close() fails while they exist
+        self.header = None
+        self.slot_headers = []
+        self.slot_images = []
+        self.shm.close()
+
+
+class VideoFrameBus(_VideoFrameBusMemory):
+    """
+    Ring of decoded video frames in shared memory.
+
+    WebRTCVideoChannel converts each frame once and writes it here; any number
+    of local processes can then read the latest frame through
+    VideoFrameBusReader without decoding or copying it again.
+    """
+
+    def __init__(self, name="go2_video", width=1280, height=720, slots=4, format="bgr24"):
+        """
+        :param name: Name of the shared memory block readers attach to.
+        :param width: Frame width; frames of another size are rescaled.
+        :param height: Frame height; frames of another size are rescaled.
+        :param slots: Number of frames kept in the ring.
+        :param format: Pixel format of the stored frames ("bgr24", "rgb24" or "gray").
+        """
+        if format not in FORMAT_CHANNELS:
+            raise ValueError(f"Unsupported frame bus format: {format}")
+        channels = FORMAT_CHANNELS[format]
+        size = _HEADER_SIZE + slots * (_SLOT_HEADER_SIZE + width * height * channels)
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        header = np.ndarray((), dtype=_HEADER_DTYPE, buffer=shm.buf, offset=0)
+        header["seq"] = 0
+        header["slots"] = slots
+        header["width"] = width
+        header["height"] = height
+        header["channels"] = channels
+        header["format"] = format.encode()
+        del header
+        super().__init__(shm)
+
+    def write_frame(self, frame, frame_index, recv_time):
+        """
+        Convert an av.VideoFrame into the next slot.
+
+        :return: Sequence number of the written frame.
+        """
+        if frame.width != self.width or frame.height != self.height:
+            frame = frame.reformat(width=self.width, height=self.height)
+        image = frame.to_ndarray(format=self.format)
+        time_base = float(frame.time_base) if frame.time_base is not None else 0.0
+        return self.write(image, frame_index, frame.pts or 0, time_base, recv_time)
+
+    def write(self, image, frame_index, pts=0, time_base=0.0, recv_time=None):
+        """Write an already converted image of the bus geometry."""
+        seq = int(self.header["seq"])
+        slot = seq % self.slots
+        header = self.slot_headers[slot]
+
+        header["slot_seq"] = 2 * seq + 1
+        np.copyto(self.slot_images[slot], image.reshape(self.slot_images[slot].shape))
+        header["frame_index"] = frame_index
+        header["pts"] = pts
+        header["time_base"] = time_base
+        header["recv_time"] = time.time() if recv_time is None else recv_time
+        header["slot_seq"] = 2 * seq + 2
+
+        self.header["seq"] = seq + 1
+        return seq + 1
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+class VideoFrameBusReader(_VideoFrameBusMemory):
+    """
+    Reads frames written by a VideoFrameBus in another process.
+
+    Images are returned as views into shared memory. A view stays valid
+    until the writer wraps around the ring (slots - 1 more frames); use
+    is_current() after processing, or copy=True, when that matters.
+    """
+
+    def __init__(self, name="go2_video"):
+        super().__init__(attach_shared_memory(name))
+
+    @property
+    def seq(self):
+        """Sequence number of the latest written frame, 0 before the first one."""
+        return int(self.header["seq"])
+
+    def read(self, seq, copy=False):
+        """
+        Return frame number `seq` (1-based) as a dict, or None if it is not available.
+
+        The dict holds seq, frame_index, pts, time_base, recv_time and image.
+        """
+        if seq <= 0 or seq > self.seq or self.seq - seq >= self.slots:
+            return None
+        slot = (seq - 1) % self.slots
+        header = self.slot_headers[slot]
+        if int(header["slot_seq"]) != 2 * seq:
+            return None
+        image = self.slot_images[slot]
+        frame = {
+            "seq": seq,
+            "frame_index": int(header["frame_index"]),
+            "pts": int(header["pts"]),
+            "time_base": float(header["time_base"]),
+            "recv_time": float(header["recv_time"]),
+            "image": image.copy() if copy else image,
+        }
+        if int(header["slot_seq"]) != 2 * seq:
+            return None
+        return frame
+
+    def latest(self, copy=False):
+        """Return the most recent frame, or None if nothing was written yet."""
+        for _ in range(3):
+            frame = self.read(self.seq, copy)
+            if frame is not None or self.seq == 0:
+                return frame
+        return None
+
+    def is_current(self, frame):
+        """Whether the slot still holds the given frame (its image view is intact)."""
+        slot = (frame["seq"] - 1) % self.slots
+        return int(self.slot_headers[slot]["slot_seq"]) == 2 * frame["seq"]
+
+    def wait_for_frame(self, after_seq=0, timeout=None, poll_interval=0.002):
+        """
+        Block until a frame newer than `after_seq` is written.
+
+        :return: The latest frame, or None on timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.seq <= after_seq:
+            if deadline is not None and time.monotonic() > deadline:
+                return None
+            time.sleep(poll_interval)
+        return self.latest()
@@ -0,0 +1,88 @@
+import time
+from collections import OrderedDict, deque
+
+from .connection_profiler import window_stats
+
+RTP_CLOCK_RATE = 90000
+
+
+def jitter_buffer_depth(receiver):
+    """
+    Number of RTP packets waiting in an RTCRtpReceiver's jitter buffer.
+
+    Reads aiortc's private JitterBuffer, returns None if its layout changed.
+    """
+    jitter_buffer = getattr(receiver, "_RTCRtpReceiver__jitter_buffer", None)
+    packets = getattr(jitter_buffer, "_packets", None)
+    if packets is None:
+        return None
+    return sum(1 for packet in packets if packet is not None)
+
+
+class VideoLatencyTracker:
+    """
+    Rolling latency statistics of the video pipeline, stage by stage.
+
+    For every frame it joins, by RTP timestamp, the moment the encoded frame
+    left the jitter buffer with the moment the decoded frame reached the
+    channel's receive loop, and collects how long frames waited in the
+    subscriber queues. The robot's clock is not synchronised with ours, so the
+    network part is reported as `network_delay`: the transit time of each
+    frame (arrival time minus RTP time) above the fastest frame seen, which is
+    the delay added by jitter, retransmissions and queuing on the way.
+    """
+
+    def __init__(self, window=300, max_pending=256):
+        """
+        :param window: Number of recent samples kept per statistic.
+        :param max_pending: Encoded frames remembered while waiting for their decoded frame.
+        """
+        self.network_delay = deque(maxlen=window)
+        self.decode_latency = deque(maxlen=window)
+        self.queue_wait = deque(maxlen=window)
+        self.jitter_buffer = deque(maxlen=window)
+        self._received = OrderedDict()
+        self._max_pending = max_pending
+        self._min_transit = None
+
+    def on_encoded_frame(self, data, timestamp):
+        """EncodedFrameTap listener: an access unit left the jitter buffer."""
+        now = time.time()
+        self._received[timestamp] = now
+        if len(self._received) > self._max_pending:
+            self._received.popitem(last=False)
+
+        transit = now - timestamp / RTP_CLOCK_RATE
+        if self._min_transit is None or transit < self._min_transit:
+            self._min_transit = transit
+        self.network_delay.append(transit - self._min_transit)
+
+    def on_decoded_frame(self, rtp_timestamp, decoded_at):
+        """
+        Record a decoded frame reaching the receive loop.
+
+        :return: Wall time its encoded frame was received, or None if unknown.
+        """
+        received_at = self._received.pop(rtp_timestamp, None)
+        if received_at is not None:
+            self.decode_latency.append(decoded_at - received_at)
+        return received_at
+
+    def on_delivered(self, wait):
+        """Record the time a frame spent in a subscriber queue."""
+        self.queue_wait.append(wait)
+
+    def sample_jitter_buffer(self, depth):
+        if depth is not None:
+            self.jitter_buffer.append(depth)
+
+    def stats(self, percentiles=(50, 90, 99)):
+        """
+        Percentiles of every stage, in seconds, plus jitter buffer depth in packets.
+        """
+        return {
+            "network_delay": window_stats(list(self.network_delay), percentiles),
+            "decode_latency": window_stats(list(self.decode_latency), percentiles),
+            "queue_wait": window_stats(list(self.queue_wait), percentiles),
+            "jitter_buffer_depth": window_stats(list(self.jitter_buffer), percentiles),
+        }
@@ -0,0 +1,150 @@
+import fractions
+import io
+import logging
+import os
+import queue
+import threading
+import time
+
+import av
+
+VIDEO_TIME_BASE = fractions.Fraction(1, 90000)
+
+# NAL unit types starting a decodable segment: IDR slice, SPS
+_KEYFRAME_NAL_TYPES = {5, 7}
+
+
+def is_keyframe(data):
+    """Whether an Annex B access unit contains an IDR slice or SPS."""
+    start = data.find(b"\x00\x00\x01")
+    while start != -1 and start + 3 < len(data):
+        if data[start + 3] & 0x1F in _KEYFRAME_NAL_TYPES:
+            return True
+        start = data.find(b"\x00\x00\x01", start + 3)
+    return False
+
+
+class EncodedVideoRecorder:
+    """
+    Muxes the robot's H.264 stream into MKV/MP4 segments without decoding it.
+
+    Encoded frames from WebRTCVideoChannel.add_encoded_frame_callback are
+    queued by write() on the event loop and muxed by a background thread, so
+    recording costs little more than the disk writes. Segments always start
+    on a keyframe; a new one is started at the first keyframe after the
+    current segment reached `segment_duration` seconds or `segment_size` bytes.
+    """
+
+    def __init__(self, directory=".", prefix="go2_video", container="mkv",
+                 segment_duration=600.0, segment_size=None, max_queue=300):
+        """
+        :param directory: Directory the segments are written to.
+        :param prefix: File name prefix, followed by the segment start time and index.
+        :param container: "mkv" or "mp4". MKV stays readable if the process dies mid-segment.
+        :param segment_duration: Seconds after which a new segment is started, None to disable.
+        :param segment_size: Bytes after which a new segment is started, None to disable.
+        :param max_queue: Encoded frames buffered for the writer before frames are dropped.
+        """
+        self.directory = directory
+        self.prefix = prefix
+        self.container = container
+        self.segment_duration = segment_duration
+        self.segment_size = segment_size
+        self.segments = []
+        self.frames_written = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._output = None
+        self._stream = None
+        self._path = None
+        self._segment_start = None
+        self._segment_bytes = 0
+        self._last_pts = None
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="video-recorder", daemon=True)
+        self._thread.start()
+
+    def write(self, data, timestamp):
+        """Queue an Annex B access unit with its 90 kHz RTP timestamp. Never blocks."""
+        try:
+            self._queue.put_nowait((data, timestamp))
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self):
+        """Finish the queued frames and close the current segment."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                try:
+                    self._mux(*item)
+                except Exception as e:
+                    logging.error(f"Failed to record video frame: {e}")
+                    self._close_segment()
+        finally:
+            self._close_segment()
+
+    def _mux(self, data, timestamp):
+        keyframe = is_keyframe(data)
+        if self._output is None:
+            if not keyframe:
+                # Wait for a keyframe, the segment could not be decoded otherwise
+                return
+            self._open_segment(data, timestamp)
+        elif keyframe and self._segment_full(timestamp):
+            self._close_segment()
+            self._open_segment(data, timestamp)
+
+        pts = timestamp - self._segment_start
+        if self._last_pts is not None and pts <= self._last_pts:
+            pts = self._last_pts + 1
+        self._last_pts = pts
+
+        packet = av.Packet(data)
+        packet.stream = self._stream
+        packet.pts = packet.dts = pts
+        packet.time_base = VIDEO_TIME_BASE
+        packet.is_keyframe = keyframe
+        self._output.mux(packet)
+        self._segment_bytes += len(data)
+        self.frames_written += 1
+
+    def _segment_full(self, timestamp):
+        if self.segment_duration is not None and \
+                (timestamp - self._segment_start) / 90000 >= self.segment_duration:
+            return True
+        return self.segment_size is not None and self._segment_bytes >= self.segment_size
+
+    def _open_segment(self, keyframe, timestamp):
+        name = f"{self.prefix}_{time.strftime('%Y%m%d_%H%M%S')}_{len(self.segments):04d}.{self.container}"
+        self._path = os.path.join(self.directory, name)
+        self._output = av.open(self._path, "w")
+        # Parse the keyframe's SPS/PPS into stream parameters instead of decoding anything
+        with av.open(io.BytesIO(keyframe), format="h264") as template:
+            self._stream = self._output.add_stream(template=template.streams.video[0])
+        self._segment_start = timestamp
+        self._segment_bytes = 0
+        self._last_pts = None
+        logging.info(f"Recording video to {self._path}")
+
+    def _close_segment(self):
+        if self._output is None:
+            return
+        try:
+            self._output.close()
+        except Exception as e:
+            logging.error(f"Failed to close {self._path}: {e}")
+        self.segments.append(self._path)
+        self._output = None
+        self._stream = None
@@ -1,41 +1,348 @@
 
 from aiortc import AudioStreamTrack, RTCRtpSender
+from aiortc.mediastreams import MediaStreamError
+import asyncio
+import inspect
 import logging
-import sounddevice as sd
-import numpy as np
-import wave
+import math
+import threading
+import time
+from collections import deque
+
+# Duration of the frames aiortc's Opus decoder produces
+AUDIO_FRAME_DURATION = 0.02
+
+
+class AudioJitterQueue:
+    """
+    Bounded queue of received audio frames between the receive task and the callbacks.
+
+    When full, the oldest frame is dropped and counted as an overrun. With a
+    latency target, frames are only handed out once that much audio is
+    buffered, and the channel then dispatches them at their real time pace;
+    finding the queue empty when the next frame is due counts as an underrun
+    and buffering starts over. The producer runs on the event loop, the
+    consumer may be another thread.
+    """
+
+    def __init__(self, latency=0.0, max_latency=0.2):
+        self.frames = deque()
+        self.overruns = 0
+        self.underruns = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self.configure(latency, max_latency)
+
+    def configure(self, latency=0.0, max_latency=0.2):
+        """
+        :param latency: Seconds of audio buffered before frames are handed out.
+        :param max_latency: Seconds of audio kept before the oldest frames are dropped.
+        """
+        with self._cond:
+            self.prefetch = math.ceil(latency / AUDIO_FRAME_DURATION)
+            self.capacity = max(1, math.ceil(max_latency / AUDIO_FRAME_DURATION), self.prefetch)
+            self._buffering = self.prefetch > 0
+            while len(self.frames) > self.capacity:
+                self.frames.popleft()
+                self.overruns += 1
+
+    def put(self, frame):
+        with self._cond:
+            if len(self.frames) >= self.capacity:
+                self.frames.popleft()
+                self.overruns += 1
+            self.frames.append(frame)
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def wake(self):
+        """Wake up threads blocked in get()."""
+        with self._cond:
+            self._cond.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def get_nowait(self):
+        """Return the next frame, or None if none is ready."""
+        with self._cond:
+            return self._next()
+
+    def get(self, timeout=None):
+        """Block until a frame is ready; None once closed or on timeout."""
+        with self._cond:
+            frame = self._next()
+            if frame is None and not self._closed:
+                self._cond.wait(timeout)
+                frame = self._next()
+            return frame
+
+    def _next(self):
+        if self._buffering:
+            if len(self.frames) < self.prefetch and not self._closed:
+                return None
+            self._buffering = False
+        if not self.frames:
+            if self.prefetch > 0 and not self._closed:
+                self.underruns += 1
+                self._buffering = True
+            return None
+        return self.frames.popleft()
+
+    def __len__(self):
+        return len(self.frames)
 
 
 class WebRTCAudioChannel:
     def __init__(self, pc, datachannel) -> None:
         self.pc = pc
-        self.pc.addTransceiver("audio", direction="sendrecv")
+        self.transceiver = self.pc.addTransceiver("audio", direction="sendrecv")
         self.datachannel = datachannel
 
         # List to hold multiple callbacks
         self.track_callbacks = []
-        
-    async def frame_handler(self, frame):
+
+        self.track = None
+        self.frames_received = 0
+        self.frames_dispatched = 0
+        # Frames between the receive task and the callbacks
+        self.queue = AudioJitterQueue()
+        self.callback_thread = False
+        self._recv_task = None
+        self._dispatch_task = None
+        self._dispatch_thread = None
+        self._data_ready = asyncio.Event()
+        self._next_due = None
+        # Optional AudioRingBuffer and AudioRecorder written by the receive task
+        self.ring_buffer = None
+        self.recorder = None
+        self._sinks = []
+
+    def set_receive_buffer(self, latency=0.0, max_latency=0.2, callback_thread=False):
+        """
+        Configure how received audio is buffered before reaching the callbacks.
+
+        :param latency: Seconds of audio buffered before callbacks run, 0 for lowest latency.
+            Use ~0.06 when feeding a sound card to ride out network jitter.
+        :param max_latency: Seconds of audio kept when callbacks fall behind; older frames are dropped.
+        :param callback_thread: Run callbacks in a dedicated thread, so blocking
+            callbacks (sound card or file writes) never stall the event loop.
+        """
+        self.queue.configure(latency, max_latency)
+        if callback_thread != self.callback_thread:
+            running = self.track is not None
+            if running:
+                self._stop_dispatcher()
+            self.callback_thread = callback_thread
+            if running:
+                self._start_dispatcher()
+
+    def enable_ring_buffer(self, seconds=10.0, layout="interleaved", channels=2):
+        """
+        Keep the last `seconds` of received audio in a preallocated int16 ring.
+
+        The ring is written by the receive task as frames arrive, ahead of the
+        callbacks, and can be sliced without copying (VAD, ASR, level meters).
+
+        :return: The AudioRingBuffer.
+        """
+        from .audio_ring_buffer import AudioRingBuffer
+
+        if self.ring_buffer is None:
+            self.ring_buffer = AudioRingBuffer(seconds, channels=channels, layout=layout)
+            self._sinks.append(self.ring_buffer)
+        return self.ring_buffer
+
+    def start_recording(self, directory=".", **kwargs):
+        """
+        Record received audio to rolling files without blocking the event loop.
+
+        :param kwargs: AudioRecorder options (format, segment_duration, prefix, ...).
+        :return: The started AudioRecorder.
+        """
+        from .audio_recorder import AudioRecorder
+
+        if self.recorder is not None:
+            raise RuntimeError("Recording is already running")
+        self.recorder = AudioRecorder(directory, **kwargs)
+        self.recorder.start()
+        self._sinks.append(self.recorder)
+        return self.recorder
+
+    async def stop_recording(self):
+        """
+        Stop recording and close the current file.
+
+        The writer thread finishes the queued frames in an executor, so the
+        event loop keeps running while it drains.
+        """
+        if self.recorder is not None:
+            recorder, self.recorder = self.recorder, None
+            self._sinks.remove(recorder)
+            await asyncio.get_running_loop().run_in_executor(None, recorder.stop)
+            return recorder
+
+    def create_push_track(self, latency=0.04, max_buffer=2.0):
+        """
+        Send application audio to the robot's speaker.
+
+        Replaces whatever the audio transceiver was sending (e.g. a MediaPlayer
+        track); push PCM to the returned track with push().
+
+        :param latency: Seconds buffered before playback of a new burst starts.
+        :param max_buffer: Seconds of audio the track keeps queued at most.
+        :return: The PushAudioTrack.
+        """
+        from .push_audio_track import PushAudioTrack
+
+        track = PushAudioTrack(latency=latency, max_buffer=max_buffer)
+        self.transceiver.sender.replaceTrack(track)
+        return track
+
+    def create_opus_track(self, cache=None):
+        """
+        Send pre-encoded Opus to the robot's speaker without re-encoding it.
+
+        Replaces whatever the audio transceiver was sending; queue clips on
+        the returned track with play() or push_packet().
+
+        :param cache: OpusClipCache to share pre-encoded clips between tracks.
+        :return: The OpusPassthroughTrack.
+        """
+        from .opus_passthrough import OpusPassthroughTrack
+
+        track = OpusPassthroughTrack(cache)
+        self.transceiver.sender.replaceTrack(track)
+        return track
+
+    def get_receive_stats(self):
+        """Counters of the receive buffer: received, dispatched, buffered, overruns and underruns."""
+        return {
+            "received": self.frames_received,
+            "dispatched": self.frames_dispatched,
+            "buffered": len(self.queue),
+            "overruns": self.queue.overruns,
+            "underruns": self.queue.underruns,
+        }
+
+    async def track_handler(self, track):
         logging.info("Receiving audio frame")
+        self.track = track
+        self._recv_task = asyncio.ensure_future(self._recv_loop())
+        self._start_dispatcher()
+
+    async def _recv_loop(self):
+        """Only reads the track, so slow callbacks never hold up reception."""
+        while True:
+            try:
+                frame = await self.track.recv()
+            except MediaStreamError:
+                logging.info("Audio track ended")
+                break
+            self.frames_received += 1
+            for sink in self._sinks:
+                try:
+                    sink.write_frame(frame)
+                except Exception as e:
+                    logging.error(f"Failed to write audio to {sink}: {e}")
+            self.queue.put(frame)
+            self._data_ready.set()
+        self.queue.close()
+        self._data_ready.set()
+
+    def _start_dispatcher(self):
+        if self.callback_thread:
+            self._dispatch_thread = threading.Thread(
+                target=self._dispatch_in_thread, name="audio-callbacks", daemon=True
+            )
+            self._dispatch_thread.start()
+        else:
+            self._dispatch_task = asyncio.ensure_future(self._dispatch_loop())
+
+    def _stop_dispatcher(self):
+        if self._dispatch_task is not None:
+            self._dispatch_task.cancel()
+            self._dispatch_task = None
+        if self._dispatch_thread is not None:
+            thread, self._dispatch_thread = self._dispatch_thread, None
+            self.queue.wake()
+            thread.join()
+
+    def _playout_delay(self, frame):
+        """Seconds to wait before dispatching a frame, pacing playout when a latency target is set."""
+        if frame is None:
+            # Buffering, or an underrun: restart the schedule with the next frame
+            self._next_due = None
+            return 0
+        if self.queue.prefetch == 0:
+            return 0
+        now = time.monotonic()
+        if self._next_due is None:
+            self._next_due = now
+        delay = self._next_due - now
+        self._next_due += frame.samples / frame.sample_rate
+        return max(0.0, delay)
+
+    async def _dispatch_loop(self):
+        while True:
+            frame = self.queue.get_nowait()
+            delay = self._playout_delay(frame)
+            if frame is None:
+                if self.queue.closed and not len(self.queue):
+                    break
+                self._data_ready.clear()
+                await self._data_ready.wait()
+                continue
+            if delay:
+                await asyncio.sleep(delay)
+            await self.frame_handler(frame)
+
+    def _dispatch_in_thread(self):
+        # Private loop to run coroutine callbacks without touching the main one
+        loop = asyncio.new_event_loop()
+        try:
+            while self._dispatch_thread is threading.current_thread():
+                frame = self.queue.get(timeout=0.5)
+                delay = self._playout_delay(frame)
+                if frame is None:
+                    if self.queue.closed and not len(self.queue):
+                        break
+                    continue
+                if delay:
+                    time.sleep(delay)
+                loop.run_until_complete(self.frame_handler(frame))
+        finally:
+            loop.close()
+
+    async def frame_handler(self, frame):
+        self.frames_dispatched += 1
 
         # Trigger all registered callbacks
         for callback in self.track_callbacks:
             try:
-                # Call each callback function and pass the track
-                await callback(frame)
+                # Call each callback function and pass the frame
+                result = callback(frame)
+                if inspect.isawaitable(result):
+                    await result
             except Exception as e:
                 logging.error(f"Error in callback {callback}: {e}")
-    
+
     def add_track_callback(self, callback):
         """
-        Adds a callback to be triggered when an audio track is received.
+        Adds a callback to be triggered for every received audio frame.
+
+        The callback may be a coroutine function or a plain function.
         """
         if callable(callback):
             self.track_callbacks.append(callback)
         else:
-            logging.warning(f"Callback {callback} is not callable.")  
+            logging.warning(f"Callback {callback} is not callable.")
 
     def switchAudioChannel(self, switch: bool):
         self.datachannel.switchAudioChannel(switch)
-    
-        
\ No newline at end of file
+
@@ -5,8 +5,10 @@ import time
 import uuid
 import os
 import hashlib
+import itertools
 from pydub import AudioSegment
 from go2_webrtc_driver.constants import AUDIO_API
+from go2_webrtc_driver.util import get_nested_field
 from go2_webrtc_driver.webrtc_driver import Go2WebRTCConnection
 import asyncio
 
@@ -17,6 +19,11 @@ class WebRTCAudioHub:
         self.logger = logger.getChild(self.__class__.__name__) if logger else logging.getLogger(self.__class__.__name__)
         self.conn = connection
         self.data_channel = None
+        # Request ids for pipelined requests; responses are matched by id, so they must not collide
+        self._request_ids = itertools.count(int(time.time() * 1000) % 2147483648)
+        # Audio list by UNIQUE_ID, kept up to date by the calls that change it
+        self._audio_list = None
+        self._audio_list_time = 0
         self._setup_data_channel()
 
     def _setup_data_channel(self):
@@ -26,6 +33,116 @@ class WebRTCAudioHub:
             raise RuntimeError("WebRTC connection not established")
         self.data_channel = self.conn.datachannel
 
+    async def request(self, api_id, parameter=None, timeout=None):
+        """
+        Send one AudioHub request with a unique id and wait for its response.
+
+        :param api_id: Name from AUDIO_API (e.g. "SELECT_DELETE") or the numeric id.
+        :param parameter: dict sent as the request parameter.
+        :param timeout: Seconds to wait for the response, None to wait forever.
+        """
+        if isinstance(api_id, str):
+            api_id = AUDIO_API[api_id]
+        request = self.data_channel.pub_sub.publish_request_new(
+            "rt/api/audiohub/request",
+            {
+                "api_id": api_id,
+                "id": next(self._request_ids),
+                "parameter": json.dumps(parameter or {})
+            }
+        )
+        if timeout is None:
+            return await request
+        return await asyncio.wait_for(request, timeout)
+
+    async def batch(self, requests, max_concurrency=8, timeout=10.0):
+        """
+        Pipeline many AudioHub requests instead of awaiting one round trip after the other.
+
+        :param requests: Iterable of (api_id, parameter) pairs, see request().
+        :param max_concurrency: Requests in flight at once.
+        :param timeout: Seconds to wait for each response.
+        :return: List of responses in request order; failed requests hold the raised exception.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def send(api_id, parameter):
+            async with semaphore:
+                try:
+                    return await self.request(api_id, parameter, timeout)
+                except Exception as e:
+                    self.logger.error(f"AudioHub request {api_id} failed: {e!r}")
+                    return e
+
+        return await asyncio.gather(*(send(api_id, parameter) for api_id, parameter in requests))
+
+    @staticmethod
+    def succeeded(response):
+        """Whether a response (or batch result) reports success."""
+        if isinstance(response, BaseException) or not isinstance(response, dict):
+            return False
+        return get_nested_field(response, "data", "header", "status", "code") in (None, 0)
+
+    async def delete_records(self, uuids, max_concurrency=8, timeout=10.0):
+        """
+        Delete many audio records concurrently.
+
+        :return: dict of UNIQUE_ID -> response or exception.
+        """
+        uuids = list(uuids)
+        responses = await self.batch(
+            [("SELECT_DELETE", {'unique_id': unique_id}) for unique_id in uuids], max_concurrency, timeout
+        )
+        for unique_id, response in zip(uuids, responses):
+            if self.succeeded(response) and self._audio_list is not None:
+                self._audio_list.pop(unique_id, None)
+        return dict(zip(uuids, responses))
+
+    async def rename_records(self, names, max_concurrency=8, timeout=10.0):
+        """
+        Rename many audio records concurrently.
+
+        :param names: dict of UNIQUE_ID -> new name.
+        :return: dict of UNIQUE_ID -> response or exception.
+        """
+        names = dict(names)
+        responses = await self.batch(
+            [("SELECT_RENAME", {'unique_id': unique_id, 'new_name': name}) for unique_id, name in names.items()],
+            max_concurrency, timeout
+        )
+        for (unique_id, name), response in zip(names.items(), responses):
+            if self.succeeded(response) and self._audio_list is not None and unique_id in self._audio_list:
+                self._audio_list[unique_id]['CUSTOM_NAME'] = name
+        return dict(zip(names, responses))
+
+    async def get_audio_index(self, max_age=None, refresh=False):
+        """
+        Cached audio list as a dict of UNIQUE_ID -> entry.
+
+        The list is fetched on first use and patched locally by the delete and
+        rename calls of this hub, so it normally costs no round trip.
+
+        :param max_age: Seconds after which the list is fetched again, None to keep it.
+        :param refresh: Fetch the list now.
+        """
+        stale = max_age is not None and time.monotonic() - self._audio_list_time > max_age
+        if self._audio_list is None or refresh or stale:
+            response = await self.get_audio_list()
+            data = get_nested_field(response, "data", "data") or '{}'
+            audio_list = json.loads(data).get('audio_list', [])
+            self._audio_list = {audio['UNIQUE_ID']: audio for audio in audio_list}
+            self._audio_list_time = time.monotonic()
+        return self._audio_list
+
+    async def find_by_name(self, name):
+        """UNIQUE_ID of the cached record named `name`, or None."""
+        audio_list = await self.get_audio_index()
+        return next((uuid for uuid, audio in audio_list.items() if audio.get('CUSTOM_NAME') == name), None)
+
+    def invalidate_audio_list(self):
+        """Fetch the audio list again on the next get_audio_index()."""
+        self._audio_list = None
+
     async def get_audio_list(self):
         """Get list of available audio files"""
         response = await self.data_channel.pub_sub.publish_request_new(
@@ -83,7 +200,7 @@ class WebRTCAudioHub:
 
     async def rename_record(self, uuid, new_name):
         """Rename an audio record"""
-        await self.data_channel.pub_sub.publish_request_new(
+        response = await self.data_channel.pub_sub.publish_request_new(
             "rt/api/audiohub/request",
             {
                 "api_id": AUDIO_API['SELECT_RENAME'],
@@ -93,10 +210,12 @@ class WebRTCAudioHub:
                 })
             }
         )
+        if self.succeeded(response) and self._audio_list is not None and uuid in self._audio_list:
+            self._audio_list[uuid]['CUSTOM_NAME'] = new_name
 
     async def delete_record(self, uuid):
         """Delete an audio record"""
-        await self.data_channel.pub_sub.publish_request_new(
+        response = await self.data_channel.pub_sub.publish_request_new(
             "rt/api/audiohub/request",
             {
                 "api_id": AUDIO_API['SELECT_DELETE'],
@@ -105,6 +224,8 @@ class WebRTCAudioHub:
                 })
             }
         )
+        if self.succeeded(response) and self._audio_list is not None:
+            self._audio_list.pop(uuid, None)
 
     async def get_play_mode(self):
         """Get current play mode"""
@@ -180,6 +301,7 @@ class WebRTCAudioHub:
                 await asyncio.sleep(0.1)
                 
             self.logger.info("All chunks sent")
+            self.invalidate_audio_list()
             return response
             
         except Exception as e:
@@ -2,7 +2,6 @@ import asyncio
 import json
 import logging
 import struct
-import sys
 from .msgs.pub_sub import WebRTCDataChannelPubSub
 from .lidar.lidar_decoder_unified import UnifiedLidarDecoder
 from .msgs.heartbeat import WebRTCDataChannelHeartBeat
@@ -20,17 +19,33 @@ class WebRTCDataChannel:
         self.data_channel_opened = False
         self.conn = conn
 
+        # Resolved once the validation handshake succeeds, or failed if the
+        # channel closes before that happens
+        self._validated = asyncio.get_running_loop().create_future()
+
         self.pub_sub = WebRTCDataChannelPubSub(self.channel)
 
         self.heartbeat = WebRTCDataChannelHeartBeat(self.channel, self.pub_sub)
         self.validaton = WebRTCDataChannelValidaton(self.channel, self.pub_sub)
         self.rtc_inner_req = WebRTCDataChannelRTCInnerReq(self.conn, self.channel, self.pub_sub)
 
-        self.set_decoder(decoder_type = 'libvoxel')
+        # The LiDAR decoder is built on the first binary message, unless
+        # set_decoder() is called explicitly before that
+        self.decoder = None
+        self.decoder_type = 'libvoxel'
+        # Optional LidarDeltaTracker, LidarPipeline and libvoxel outputs, kept
+        # per connection since decoders may be shared
+        self.lidar_delta = None
+        self.lidar_pipeline = None
+        self.lidar_unique_points = False
+        self.lidar_indexed_mesh = False
 
         #Event handler for Validation succeed
         def on_validate():
             self.data_channel_opened = True
+            self.conn.timeline.end("validation")
+            if not self._validated.done():
+                self._validated.set_result(True)
             self.heartbeat.start_heartbeat()
             self.rtc_inner_req.network_status.start_network_status_fetch()
             print_status("Data Channel Verification", "✅ OK")
@@ -48,12 +63,16 @@ class WebRTCDataChannel:
         @self.channel.on("open")
         def on_open():
             logging.info("Data channel opened")
+            self.conn.timeline.end("sctp_open")
+            self.conn.timeline.start("validation")
 
         # Event handler for data channel close
         @self.channel.on("close")
         def on_close():
             logging.info("Data channel closed")
             self.data_channel_opened = False
+            if not self._validated.done():
+                self._validated.set_exception(ConnectionError("Data channel closed before validation"))
             self.heartbeat.stop_heartbeat()
             self.rtc_inner_req.network_status.stop_network_status_fetch()
             
@@ -101,17 +120,18 @@ class WebRTCDataChannel:
         
 
     async def wait_datachannel_open(self, timeout=5):
-        """Waits for the data channel to open asynchronously."""
+        """
+        Wait until the data channel is open and validated.
+
+        :param timeout: Seconds to wait before giving up.
+        :raises TimeoutError: If validation did not complete in time.
+        :raises ConnectionError: If the channel closed before validation.
+        """
         try:
-            await asyncio.wait_for(self._wait_for_open(), timeout)
+            # Shield the future so a timeout does not cancel it for other waiters
+            await asyncio.wait_for(asyncio.shield(self._validated), timeout)
         except asyncio.TimeoutError:
-            print("Data channel did not open in time")
-            sys.exit(1)
-
-    async def _wait_for_open(self):
-        """Internal function that waits for the data channel to be opened."""
-        while not self.data_channel_opened:
-            await asyncio.sleep(0.1)
+            raise TimeoutError(f"Data channel did not open within {timeout}s") from None
     
 
     def deal_array_buffer(self, buffer):
@@ -128,7 +148,7 @@ class WebRTCDataChannel:
 
         decoded_json = json.loads(json_data.decode('utf-8'))
 
-        decoded_data = self.decoder.decode(binary_data, decoded_json['data'])
+        decoded_data = self.decode_lidar(binary_data, decoded_json['data'])
 
         decoded_json['data']['data'] = decoded_data
         return decoded_json
@@ -140,7 +160,7 @@ class WebRTCDataChannel:
 
         decoded_json = json.loads(json_data.decode('utf-8'))
 
-        decoded_data = self.decoder.decode(binary_data, decoded_json['data'])
+        decoded_data = self.decode_lidar(binary_data, decoded_json['data'])
 
         decoded_json['data']['data'] = decoded_data
         return decoded_json
@@ -182,17 +202,78 @@ class WebRTCDataChannel:
         )
         print(f"Audio channel: {'on' if switch else 'off'}")
     
-    def set_decoder(self, decoder_type):
+    def set_decoder(self, decoder_type, unique_points=False, indexed_mesh=False):
         """
         Set the decoder to be used for decoding incoming data.
 
         :param decoder_type: The type of decoder to use ("libvoxel" or "native").
+        :param unique_points: libvoxel only, add the deduplicated mesh vertices as "unique_positions".
+        :param indexed_mesh: libvoxel only, add "vertices" and "triangles" of an indexed mesh.
         """
         if decoder_type not in ["libvoxel", "native"]:
             raise ValueError("Invalid decoder type. Choose 'libvoxel' or 'native'.")
-
-        # Create an instance of UnifiedLidarDecoder with the specified type
-        self.decoder = UnifiedLidarDecoder(decoder_type=decoder_type)
+        if decoder_type != "libvoxel" and (unique_points or indexed_mesh):
+            raise ValueError("Unique points and indexed meshes are only produced by the libvoxel decoder")
+
+        # Create an instance of UnifiedLidarDecoder with the specified type,
+        # or take the shared one if the connection uses a decoder pool
+        self.decoder_type = decoder_type
+        if self.conn.decoder_pool is not None:
+            self.decoder = self.conn.decoder_pool.get(decoder_type)
+        else:
+            self.decoder = UnifiedLidarDecoder(decoder_type=decoder_type)
+        self.lidar_unique_points = unique_points
+        self.lidar_indexed_mesh = indexed_mesh
         print(f"Decoder set to: {self.decoder.get_decoder_name()}")
+
+    def enable_lidar_delta(self, full_frames=False):
+        """
+        Add the voxels added and removed since the previous frame to every
+        LiDAR message, under message["data"]["data"]["delta"].
+
+        :param full_frames: Also decode the full frame; by default only the
+            delta is produced, which skips building points with the native decoder.
+        :return: The LidarDeltaTracker.
+        """
+        from .lidar.lidar_delta import LidarDeltaTracker
+
+        self.lidar_delta = LidarDeltaTracker(full_frames=full_frames)
+        return self.lidar_delta
+
+    def disable_lidar_delta(self):
+        self.lidar_delta = None
+
+    def set_lidar_pipeline(self, height_band=None, crop=None, voxel_size=None, transform=None):
+        """
+        Filter the LiDAR frames of this connection while they are decoded.
+
+        Messages then carry the filtered points in message["data"]["data"]["points"].
+        See LidarPipeline for the stages; call without arguments to remove it.
+
+        :return: The LidarPipeline, or None.
+        """
+        from .lidar.lidar_pipeline import LidarPipeline
+
+        stages = (height_band, crop, voxel_size, transform)
+        self.lidar_pipeline = None if all(stage is None for stage in stages) else LidarPipeline(*stages)
+        return self.lidar_pipeline
+
+    def decode_lidar(self, binary_data, metadata):
+        if self.lidar_delta is not None:
+            result = self.lidar_delta.decode(self.get_decoder(), binary_data, metadata, self.lidar_pipeline)
+        else:
+            result = self.get_decoder().decode(binary_data, metadata, self.lidar_pipeline)
+        if (self.lidar_unique_points or self.lidar_indexed_mesh) and "positions" in result:
+            from .lidar.lidar_decoder_libvoxel import add_unique_vertices
+            add_unique_vertices(result, self.lidar_unique_points, self.lidar_indexed_mesh)
+        return result
+
+    def get_decoder(self):
+        """
+        Return the current decoder, creating the default one on first use.
+        """
+        if self.decoder is None:
+            self.set_decoder(self.decoder_type)
+        return self.decoder
     
     
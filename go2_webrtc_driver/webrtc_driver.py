@@ -1,59 +1,95 @@
 import asyncio
 import logging
 import json
-import sys
 from aiortc import RTCPeerConnection, RTCSessionDescription, RTCIceServer, RTCConfiguration
-from aiortc.contrib.media import MediaPlayer
 from .unitree_auth import send_sdp_to_local_peer, send_sdp_to_remote_peer
 from .webrtc_datachannel import WebRTCDataChannel
 from .webrtc_audio import WebRTCAudioChannel
 from .webrtc_video import WebRTCVideoChannel
 from .constants import DATA_CHANNEL_TYPE, WebRTCConnectionMethod
 from .util import fetch_public_key, fetch_token, fetch_turn_server_info, print_status
-from .multicast_scanner import discover_ip_sn
+from .multicast_scanner import acquire_shared_discovery, release_shared_discovery
+from .connection_profiler import ConnectionTimeline
 
 # # Enable logging for debugging
 # logging.basicConfig(level=logging.INFO)
 
 class Go2WebRTCConnection:
-    def __init__(self, connectionMethod: WebRTCConnectionMethod, serialNumber=None, ip=None, username=None, password=None) -> None:
+    def __init__(self, connectionMethod: WebRTCConnectionMethod, serialNumber=None, ip=None, username=None, password=None, datachannel_timeout=5, timeline_log=None, discovery=None, decoder_pool=None, video_decode_thread=False) -> None:
         self.pc = None
         self.sn = serialNumber
         self.ip = ip
         self.connectionMethod = connectionMethod
         self.isConnected = False
-        self.token = fetch_token(username, password) if username and password else ""
+        self.datachannel_timeout = datachannel_timeout
+        self.username = username
+        self.password = password
+        self.token = ""
+        # Timeline of the most recent connect() attempt
+        self.timeline = ConnectionTimeline()
+        # Optional path of a JSON lines file every timeline is appended to
+        self.timeline_log = timeline_log
+        # MulticastDiscovery used to resolve the serial number; defaults to the loop-wide shared one
+        self.discovery = discovery
+        # Loop-wide discovery held by this connection until disconnect()
+        self._shared_discovery = None
+        # Optional LidarDecoderPool shared with other connections on the same loop
+        self.decoder_pool = decoder_pool
+        # Decode video with a multi-threaded decoder in a dedicated thread, see WebRTCVideoChannel.enable_decode_thread
+        self.video_decode_thread = video_decode_thread
 
     async def connect(self):
         print_status("WebRTC connection", "🟡 started")
+        self.timeline = ConnectionTimeline()
+
+        if not self.token and self.username and self.password:
+            with self.timeline.phase("token_fetch"):
+                self.token = fetch_token(self.username, self.password)
+
         if self.connectionMethod == WebRTCConnectionMethod.Remote:
-            self.public_key = fetch_public_key()
-            turn_server_info = fetch_turn_server_info(self.sn, self.token, self.public_key)
+            with self.timeline.phase("public_key"):
+                self.public_key = fetch_public_key()
+            with self.timeline.phase("turn_info"):
+                turn_server_info = fetch_turn_server_info(self.sn, self.token, self.public_key)
             await self.init_webrtc(turn_server_info)
         elif self.connectionMethod == WebRTCConnectionMethod.LocalSTA:
             if not self.ip and self.sn:
-                discovered_ip_sn_addresses = discover_ip_sn()
-                
-                if discovered_ip_sn_addresses:
-                    if self.sn in discovered_ip_sn_addresses:
-                        self.ip = discovered_ip_sn_addresses[self.sn]
-                    else:
+                if self.discovery is None and self._shared_discovery is None:
+                    self._shared_discovery = acquire_shared_discovery()
+                discovery = self.discovery or self._shared_discovery
+                with self.timeline.phase("discovery"):
+                    self.ip = await discovery.discover(self.sn)
+
+                if not self.ip:
+                    self._release_discovery()
+                    if discovery.devices():
                         raise ValueError("The provided serial number wasn't found on the network. Provide an IP address instead.")
-                else:
-                    raise ValueError("No devices found on the network. Provide an IP address instead.")
+                    else:
+                        raise ValueError("No devices found on the network. Provide an IP address instead.")
 
             await self.init_webrtc(ip=self.ip)
         elif self.connectionMethod == WebRTCConnectionMethod.LocalAP:
             self.ip = "192.168.12.1"
             await self.init_webrtc(ip=self.ip)
+
+        logging.info("Connection timeline: %r", self.timeline)
+        if self.timeline_log:
+            with open(self.timeline_log, "a") as f:
+                f.write(self.timeline.to_json() + "\n")
     
     async def disconnect(self):
         if self.pc:
             await self.pc.close()
             self.pc = None
+        self._release_discovery()
         self.isConnected = False
         print_status("WebRTC connection", "🔴 disconnected")
 
+    def _release_discovery(self):
+        if self._shared_discovery is not None:
+            release_shared_discovery(self._shared_discovery)
+            self._shared_discovery = None
+
     async def reconnect(self):
         await self.disconnect()
         await self.connect()
@@ -96,12 +132,20 @@ class Go2WebRTCConnection:
     async def init_webrtc(self, turn_server_info=None, ip=None):
         configuration = self.create_webrtc_configuration(turn_server_info)
         self.pc = RTCPeerConnection(configuration)
-
-
+        try:
+            await self._open_peer_connection(turn_server_info)
+        except (Exception, asyncio.CancelledError):
+            # Close the half-open peer connection instead of leaking it
+            await self.disconnect()
+            raise
+
+    async def _open_peer_connection(self, turn_server_info):
         self.datachannel = WebRTCDataChannel(self, self.pc)
 
         self.audio = WebRTCAudioChannel(self.pc, self.datachannel)
         self.video = WebRTCVideoChannel(self.pc, self.datachannel)
+        if self.video_decode_thread:
+            self.video.enable_decode_thread()
 
         @self.pc.on("icegatheringstatechange")
         async def on_ice_gathering_state_change():
@@ -134,6 +178,8 @@ class Go2WebRTCConnection:
                 print_status("Peer Connection State", "🔵 connecting")
             elif state == "connected":
                 self.isConnected= True
+                self.timeline.end("ice_dtls")
+                self.timeline.start("sctp_open")
                 print_status("Peer Connection State", "🟢 connected")
             elif state == "closed":
                 self.isConnected= False
@@ -158,39 +204,42 @@ class Go2WebRTCConnection:
             logging.info("Track recieved: %s", track.kind)
 
             if track.kind == "video":
-                #await for the first frame, #ToDo make the code more nicer
-                frame = await track.recv()
+                # The video channel owns the only reader of the track and fans frames out
                 await self.video.track_handler(track)
                 
             if track.kind == "audio":
-                frame = await track.recv()
-                while True:
-                    frame = await track.recv()
-                    await self.audio.frame_handler(frame)
+                # The audio channel owns the receive task and dispatches frames to the callbacks
+                await self.audio.track_handler(track)
 
         logging.info("Creating offer...")
-        offer = await self.pc.createOffer()
-        await self.pc.setLocalDescription(offer)
-
-        if self.connectionMethod == WebRTCConnectionMethod.Remote:
-            peer_answer_json = await self.get_answer_from_remote_peer(self.pc, turn_server_info)
-        elif self.connectionMethod == WebRTCConnectionMethod.LocalSTA or self.connectionMethod == WebRTCConnectionMethod.LocalAP:
-            peer_answer_json = await self.get_answer_from_local_peer(self.pc, self.ip)
+        with self.timeline.phase("create_offer"):
+            offer = await self.pc.createOffer()
+        # aiortc gathers ICE candidates while setting the local description
+        with self.timeline.phase("ice_gathering"):
+            await self.pc.setLocalDescription(offer)
+
+        with self.timeline.phase("sdp_exchange"):
+            if self.connectionMethod == WebRTCConnectionMethod.Remote:
+                peer_answer_json = await self.get_answer_from_remote_peer(self.pc, turn_server_info)
+            elif self.connectionMethod == WebRTCConnectionMethod.LocalSTA or self.connectionMethod == WebRTCConnectionMethod.LocalAP:
+                peer_answer_json = await self.get_answer_from_local_peer(self.pc, self.ip)
 
         if peer_answer_json is not None:
             peer_answer = json.loads(peer_answer_json)
         else:
-            print("Could not get SDP from the peer. Check if the Go2 is switched on")
-            sys.exit(1)
+            raise ValueError("Could not get SDP from the peer. Check if the Go2 is switched on")
 
         if peer_answer['sdp'] == "reject":
-            print("Go2 is connected by another WebRTC client. Close your mobile APP and try again.")
-            sys.exit(1)
+            raise ValueError("Go2 is connected by another WebRTC client. Close your mobile APP and try again.")
 
         remote_sdp = RTCSessionDescription(sdp=peer_answer['sdp'], type=peer_answer['type']) 
-        await self.pc.setRemoteDescription(remote_sdp)
+        with self.timeline.phase("remote_description"):
+            await self.pc.setRemoteDescription(remote_sdp)
+        # ICE connectivity checks and the DTLS handshake run in the background
+        # and complete when the peer connection reports "connected"
+        self.timeline.start("ice_dtls")
    
-        await self.datachannel.wait_datachannel_open()
+        await self.datachannel.wait_datachannel_open(self.datachannel_timeout)
 
     
     async def get_answer_from_remote_peer(self, pc, turn_server_info):
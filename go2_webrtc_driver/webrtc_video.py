@@ -1,34 +1,498 @@
+import asyncio
 import logging
+import time
+import av
 from .webrtc_datachannel import WebRTCDataChannel
+from .video_latency import VideoLatencyTracker, jitter_buffer_depth
 from aiortc import RTCPeerConnection
+from aiortc.mediastreams import MediaStreamError, MediaStreamTrack
+
+
+def crop_yuv420p(frame, x, y, width, height):
+    """
+    Crop a yuv420p av.VideoFrame by slicing its planes, without any colour conversion.
+
+    The rectangle is aligned down to even coordinates, as chroma is subsampled
+    by two, and clipped to the frame.
+    """
+    import numpy as np
+
+    if frame.format.name != "yuv420p":
+        frame = frame.reformat(format="yuv420p")
+    x, y = max(0, x) & ~1, max(0, y) & ~1
+    width = min(width, frame.width - x) & ~1
+    height = min(height, frame.height - y) & ~1
+    if width <= 0 or height <= 0:
+        raise ValueError(f"Crop rectangle {(x, y, width, height)} is outside the frame")
+
+    planes = []
+    for index, scale in ((0, 1), (1, 2), (2, 2)):
+        plane = frame.planes[index]
+        rows = np.frombuffer(plane, np.uint8).reshape(-1, plane.line_size)
+        planes.append(rows[y // scale:(y + height) // scale, x // scale:(x + width) // scale].ravel())
+    cropped = av.VideoFrame.from_ndarray(
+        np.concatenate(planes).reshape(height * 3 // 2, width), format="yuv420p"
+    )
+    cropped.pts = frame.pts
+    cropped.time_base = frame.time_base
+    return cropped
+
+
+# Single plane formats converted into `out` directly, with their bytes per pixel
+_PACKED_FORMATS = {"gray": 1, "rgb24": 3, "bgr24": 3, "rgba": 4, "bgra": 4, "argb": 4, "abgr": 4}
+
+
+def _copy_plane(plane, row_bytes, height, out):
+    """Copy the first `row_bytes` of each of `height` rows of a plane into a (height, row_bytes) array."""
+    import numpy as np
+
+    rows = np.frombuffer(plane, np.uint8).reshape(-1, plane.line_size)
+    np.copyto(out, rows[:height, :row_bytes])
+
+
+class CachedVideoFrame:
+    """
+    Decoded frame shared by all subscribers of a WebRTCVideoChannel.
+
+    Conversions are done lazily on the first to_ndarray() call for a format
+    and cached, so subscribers asking for the same format share one
+    conversion. Other attributes (pts, time_base, width, reformat, ...) are
+    forwarded to the wrapped av.VideoFrame, available as `frame`.
+
+    A frame can also be a cropped and/or downscaled view of another frame,
+    see derive(); the crop and scale are only done when the frame is used.
+
+    Frames delivered by the channel carry their timing: `rtp_timestamp`
+    (90 kHz, relative to the start of the stream), `received_at` (wall time
+    the encoded frame left the jitter buffer, only with latency tracking
+    enabled) and `decoded_at` (wall time the decoded frame reached the
+    channel).
+    """
+
+    def __init__(self, frame, crop=None, size=None):
+        self._source = frame
+        self._crop = crop
+        self._size = size
+        self._frame = None if crop or size else frame
+        self._arrays = {}
+        self._derived = {}
+        self.rtp_timestamp = frame.pts
+        self.received_at = None
+        self.decoded_at = None
+
+    @property
+    def frame(self):
+        if self._frame is None:
+            frame = self._source
+            if self._crop is not None:
+                frame = crop_yuv420p(frame, *self._crop)
+            if self._size is not None:
+                # Scale in YUV, colour conversion happens later at the reduced size
+                frame = frame.reformat(width=self._size[0], height=self._size[1])
+            self._frame = frame
+        return self._frame
+
+    def __getattr__(self, name):
+        return getattr(self.frame, name)
+
+    def derive(self, crop=None, size=None):
+        """
+        Return a lazily cropped and scaled frame, shared by subscribers with the same options.
+
+        :param crop: (x, y, width, height) region of interest, applied first.
+        :param size: (width, height) to scale to.
+        """
+        if not crop and not size:
+            return self
+        key = (crop, size)
+        derived = self._derived.get(key)
+        if derived is None:
+            derived = CachedVideoFrame(self._source, crop, size)
+            derived.received_at = self.received_at
+            derived.decoded_at = self.decoded_at
+            self._derived[key] = derived
+        return derived
+
+    def to_ndarray(self, format="bgr24", out=None):
+        """
+        Return the frame as a numpy array in the given format.
+
+        The returned array is shared with the other subscribers and must not be
+        modified. Pass `out` to have the frame written into a preallocated
+        array instead: a conversion another subscriber already made is copied,
+        otherwise yuv420p and gray planes are copied straight from the frame
+        and packed RGB formats from PyAV's converted frame, without an
+        intermediate array. Conversions into `out` are not shared.
+
+        :param format: "yuv420p", "gray", "bgr24", "rgb24" or any other PyAV format.
+        :param out: Optional array of the right shape to write the result into.
+        """
+        array = self._arrays.get(format)
+        if out is None:
+            if array is None:
+                array = self.frame.to_ndarray(format=format)
+                self._arrays[format] = array
+            return array
+
+        import numpy as np
+
+        if array is not None:
+            np.copyto(out, array)
+        elif format == "yuv420p":
+            frame = self.frame
+            if frame.format.name != "yuv420p":
+                frame = frame.reformat(format="yuv420p")
+            # Same layout as PyAV's array: the Y, U and V planes one after the other
+            flat = out.reshape(-1)
+            offset = 0
+            for index, scale in ((0, 1), (1, 2), (2, 2)):
+                width, height = frame.width // scale, frame.height // scale
+                _copy_plane(frame.planes[index], width, height, flat[offset:offset + width * height].reshape(height, width))
+                offset += width * height
+        elif format in _PACKED_FORMATS:
+            frame = self.frame.reformat(format=format)
+            _copy_plane(frame.planes[0], frame.width * _PACKED_FORMATS[format], frame.height,
+                        out.reshape(frame.height, -1))
+        else:
+            np.copyto(out, self.frame.to_ndarray(format=format))
+        return out
+
+
+class VideoSubscriberTrack(MediaStreamTrack):
+    """
+    Per-subscriber view of the robot's video track, yielding CachedVideoFrame.
+
+    Frames are fanned out by WebRTCVideoChannel into a bounded queue. When
+    the subscriber falls behind, the oldest queued frame is dropped and
+    counted in `dropped`, so a slow consumer never delays the others.
+
+    Frames above `max_fps` are skipped before anything is converted, and
+    `crop`/`size` are applied in YUV before the colour conversion, so a
+    consumer needing low rate, small images pays only for those.
+    """
+
+    kind = "video"
+
+    def __init__(self, channel, queue_size=2, max_fps=None, crop=None, size=None):
+        super().__init__()
+        self.channel = channel
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.max_fps = max_fps
+        self.crop = tuple(crop) if crop else None
+        self.size = tuple(size) if size else None
+        self.received = 0
+        self.dropped = 0
+        self.skipped = 0
+        # Seconds the last frame returned by recv() waited in the queue
+        self.last_queue_wait = None
+        self._next_time = None
+
+    def _accept(self, frame):
+        if self.max_fps is None:
+            return True
+        t = frame.time if frame.time is not None else time.monotonic()
+        interval = 1 / self.max_fps
+        # Half a millisecond of slack for timestamps landing exactly on the interval
+        if self._next_time is not None and t < self._next_time - 0.0005:
+            self.skipped += 1
+            return False
+        if self._next_time is None or t - self._next_time > interval:
+            # First frame, or the stream paused: restart the schedule
+            self._next_time = t + interval
+        else:
+            self._next_time += interval
+        return True
+
+    def put_frame(self, frame):
+        """Queue a frame, dropping the oldest one if the queue is full."""
+        if not self._accept(frame):
+            return
+        frame = frame.derive(self.crop, self.size)
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait((frame, time.monotonic()))
+        self.received += 1
+
+    def end(self):
+        """Signal the end of the stream once the queued frames are consumed."""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(None)
+
+    async def recv(self):
+        if self.readyState != "live":
+            raise MediaStreamError
+        item = await self.queue.get()
+        if item is None:
+            self.stop()
+            raise MediaStreamError
+        frame, enqueued_at = item
+        self.last_queue_wait = time.monotonic() - enqueued_at
+        if self.channel.latency is not None:
+            self.channel.latency.on_delivered(self.last_queue_wait)
+        return frame
+
+    def stop(self):
+        super().stop()
+        self.channel.unsubscribe(self)
+
 
 class WebRTCVideoChannel:
     def __init__(self, pc:RTCPeerConnection, datachannel:WebRTCDataChannel) -> None:
         self.pc = pc
-        self.pc.addTransceiver("video", direction="recvonly")
+        self.transceiver = self.pc.addTransceiver("video", direction="recvonly")
         self.datachannel = datachannel
         # List to hold multiple callbacks
         self.track_callbacks = []
-    
+        self._callback_options = {}
+
+        self.track = None
+        self.frame_index = 0
+        self.subscribers = []
+        self._callback_tasks = []
+        # Optional VideoFrameBus fed by the receive loop
+        self.frame_bus = None
+        self._recv_task = None
+        # Optional ThreadedVideoDecoder replacing aiortc's single threaded decoder
+        self.decoder = None
+        # Optional EncodedVideoRecorder fed with the encoded frames
+        self.recorder = None
+        # Optional VideoLatencyTracker
+        self.latency = None
+
     def switchVideoChannel(self, switch: bool):
         self.datachannel.switchVideoChannel(switch)
-    
-    def add_track_callback(self, callback):
+
+    def add_track_callback(self, callback, **options):
         """
-        Adds a callback to be triggered when an audio track is received.
+        Adds a callback to be triggered when a video track is received.
+
+        Each callback gets its own VideoSubscriberTrack, so several callbacks
+        can loop on `await track.recv()` at the same time and all of them
+        receive every frame.
+
+        :param options: subscribe() options for the callback's track (max_fps, crop, size, queue_size).
         """
         if callable(callback):
             self.track_callbacks.append(callback)
+            self._callback_options[callback] = options
+            if self.track is not None:
+                self._run_callback(callback)
         else:
-            logging.warning(f"Callback {callback} is not callable.")  
-    
-    async def track_handler(self, track):
-        logging.info("Receiving video frame")
-        # Trigger all registered callbacks
-        for callback in self.track_callbacks:
+            logging.warning(f"Callback {callback} is not callable.")
+
+    def subscribe(self, queue_size=2, max_fps=None, crop=None, size=None) -> VideoSubscriberTrack:
+        """
+        Create a subscriber receiving the decoded frames.
+
+        :param queue_size: Frames buffered before the oldest is dropped.
+        :param max_fps: Deliver at most this many frames per second.
+        :param crop: (x, y, width, height) region of interest, in source pixels.
+        :param size: (width, height) to scale the (cropped) frames to.
+        """
+        subscriber = VideoSubscriberTrack(self, queue_size, max_fps, crop, size)
+        self.subscribers.append(subscriber)
+        self._start_receiving()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        if subscriber in self.subscribers:
+            self.subscribers.remove(subscriber)
+
+    def get_dropped_frames(self):
+        """Dropped frame count per subscriber."""
+        return {subscriber.id: subscriber.dropped for subscriber in self.subscribers}
+
+    def _run_callback(self, callback):
+        # Subscribe before scheduling so the callback does not miss the first frames
+        subscriber = self.subscribe(**self._callback_options.get(callback, {}))
+
+        async def run():
             try:
-                # Call each callback function and pass the track
-                await callback(track)
+                # Call the callback function and pass its own subscriber track
+                await callback(subscriber)
+            except MediaStreamError:
+                pass
             except Exception as e:
                 logging.error(f"Error in callback {callback}: {e}")
-    
\ No newline at end of file
+
+        self._callback_tasks.append(asyncio.ensure_future(run()))
+
+    def enable_decode_thread(self, thread_type="AUTO", thread_count=0):
+        """
+        Decode H.264 in a dedicated thread using libavcodec's own threading.
+
+        Call before connecting (or pass video_decode_thread=True to
+        Go2WebRTCConnection); enabled later, decoding resumes at the next keyframe.
+
+        :return: The ThreadedVideoDecoder, whose stats() report decode times.
+        """
+        from .video_decoder import ThreadedVideoDecoder
+
+        if self.decoder is not None:
+            return self.decoder
+        self.decoder = ThreadedVideoDecoder(thread_type, thread_count)
+        if self.track is not None:
+            self._install_decoder()
+        return self.decoder
+
+    def get_decode_stats(self):
+        """Statistics of the threaded decoder, or None when it is not enabled."""
+        return self.decoder.stats() if self.decoder is not None else None
+
+    def _install_decoder(self):
+        receiver = self.transceiver.receiver
+        tap = self._get_encoded_frame_tap()
+        if tap.decoder is not None:
+            return
+        self.decoder.start(receiver.track._queue, asyncio.get_event_loop())
+        tap.decoder = self.decoder
+
+    def _get_encoded_frame_tap(self):
+        from .video_decoder import EncodedFrameTap
+
+        return EncodedFrameTap.install(self.transceiver.receiver)
+
+    def add_encoded_frame_callback(self, callback):
+        """
+        Receive every H.264 frame as it comes off the jitter buffer, before decoding.
+
+        The callback is called on the event loop with (data, timestamp): an
+        Annex B access unit and its 90 kHz RTP timestamp. It must not block.
+        """
+        self._get_encoded_frame_tap().listeners.append(callback)
+
+    def remove_encoded_frame_callback(self, callback):
+        listeners = self._get_encoded_frame_tap().listeners
+        if callback in listeners:
+            listeners.remove(callback)
+
+    def start_recording(self, directory=".", **kwargs):
+        """
+        Record the camera to MKV/MP4 segments without decoding it.
+
+        :param kwargs: EncodedVideoRecorder options (container, segment_duration, ...).
+        :return: The started EncodedVideoRecorder.
+        """
+        from .video_recorder import EncodedVideoRecorder
+
+        if self.recorder is not None:
+            raise RuntimeError("Recording is already running")
+        self.recorder = EncodedVideoRecorder(directory, **kwargs)
+        self.recorder.start()
+        self.add_encoded_frame_callback(self.recorder.write)
+        return self.recorder
+
+    async def stop_recording(self):
+        """
+        Stop recording and close the current segment.
+
+        The writer thread finishes the queued frames in an executor, so the
+        event loop keeps running while it drains.
+        """
+        if self.recorder is not None:
+            recorder, self.recorder = self.recorder, None
+            self.remove_encoded_frame_callback(recorder.write)
+            await asyncio.get_running_loop().run_in_executor(None, recorder.stop)
+            return recorder
+
+    def enable_latency_tracking(self, window=300):
+        """
+        Annotate frames with their receive time and keep rolling latency statistics.
+
+        :param window: Number of recent frames the statistics are computed over.
+        :return: The VideoLatencyTracker, also used by get_latency_stats().
+        """
+        if self.latency is None:
+            self.latency = VideoLatencyTracker(window)
+            self.add_encoded_frame_callback(self.latency.on_encoded_frame)
+        return self.latency
+
+    def get_latency_stats(self):
+        """
+        Latency percentiles of the video pipeline, or None when tracking is not enabled.
+
+        network_delay, decode_latency (jitter buffer to receive loop) and
+        queue_wait (receive loop to subscriber) are in seconds,
+        jitter_buffer_depth in RTP packets, decoded_backlog in frames.
+        """
+        if self.latency is None:
+            return None
+        stats = self.latency.stats()
+        stats["decoded_backlog"] = self.track._queue.qsize() if self.track is not None else 0
+        return stats
+
+    def enable_frame_bus(self, name="go2_video", width=1280, height=720, slots=4, format="bgr24"):
+        """
+        Publish every received frame into a shared memory VideoFrameBus.
+
+        Frames are decoded and converted once by the channel's receive loop;
+        other processes read them with VideoFrameBusReader(name).
+
+        :return: The created VideoFrameBus.
+        """
+        from .video_frame_bus import VideoFrameBus
+
+        if self.frame_bus is not None:
+            raise RuntimeError("Frame bus is already enabled")
+        self.frame_bus = VideoFrameBus(name, width, height, slots, format)
+        self._start_receiving()
+        return self.frame_bus
+
+    def disable_frame_bus(self):
+        """Stop publishing to the frame bus and release its shared memory."""
+        if self.frame_bus is not None:
+            frame_bus, self.frame_bus = self.frame_bus, None
+            frame_bus.close()
+            frame_bus.unlink()
+
+    def _start_receiving(self):
+        if self.track is None:
+            return
+        if self._recv_task is None or self._recv_task.done():
+            self._recv_task = asyncio.ensure_future(self._recv_loop())
+
+    async def _recv_loop(self):
+        """
+        Single reader of the video track, fanning frames out to all subscribers.
+
+        The track is drained even without subscribers so decoded frames do not
+        pile up in aiortc's unbounded queue.
+        """
+        while True:
+            try:
+                frame = await self.track.recv()
+            except MediaStreamError:
+                logging.info("Video track ended")
+                for subscriber in list(self.subscribers):
+                    subscriber.end()
+                break
+            recv_time = time.time()
+            self.frame_index += 1
+            frame = CachedVideoFrame(frame)
+            frame.decoded_at = recv_time
+            if self.latency is not None:
+                frame.received_at = self.latency.on_decoded_frame(frame.rtp_timestamp, recv_time)
+                self.latency.sample_jitter_buffer(jitter_buffer_depth(self.transceiver.receiver))
+
+            for subscriber in self.subscribers:
+                subscriber.put_frame(frame)
+
+            if self.frame_bus is not None:
+                try:
+                    self.frame_bus.write_frame(frame, self.frame_index, recv_time)
+                except Exception as e:
+                    logging.error(f"Failed to write frame to the frame bus: {e}")
+
+    async def track_handler(self, track):
+        logging.info("Receiving video frame")
+        self.track = track
+        if self.decoder is not None:
+            self._install_decoder()
+        self._start_receiving()
+
+        # Trigger all registered callbacks concurrently
+        for callback in self.track_callbacks:
+            self._run_callback(callback)
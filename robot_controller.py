@@ -757,8 +757,8 @@ class RobotController:
         try:
             while self.camera_enabled.get():
                 frame = await track.recv()
-                # Convert the frame to a NumPy array
-                img = frame.to_ndarray(format="bgr24")
+                # Convert the frame straight to the RGB array Tkinter displays
+                img = frame.to_ndarray(format="rgb24")
                 self.frame_queue.put(img)
         except asyncio.CancelledError:
             logger.info("Camera stream task cancelled")
@@ -773,10 +773,7 @@ class RobotController:
             
         if not self.frame_queue.empty():
             # Get the latest frame
-            frame = self.frame_queue.get()
-            
-            # Convert the OpenCV frame to a format Tkinter can display
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            frame_rgb = self.frame_queue.get()
             
             # Resize the frame to fit the canvas if needed
             canvas_width = self.camera_canvas.winfo_width()